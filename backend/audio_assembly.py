@@ -0,0 +1,84 @@
+import wave
+from typing import List, Optional, Tuple
+
+# 每次複製的 frame 數量(24kHz 約 2.7 秒)，記憶體用量與整集長度無關
+COPY_FRAMES = 65536
+
+
+class WavAssembler:
+    """
+    以串流方式將多個相同格式的 PCM WAV 接成一個檔案
+
+    只寫一次 RIFF 標頭，依序複製各段落的 PCM frame 與靜音區塊，關閉時由 wave 模組回填標頭中的長度，
+    整集音檔不會同時放在記憶體中，耗時與總長度成線性關係。
+    """
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self._writer: Optional[wave.Wave_write] = None
+        self._params = None
+        self.frames = 0
+
+    @property
+    def framerate(self) -> int:
+        return self._params[2] if self._params else 0
+
+    @property
+    def duration(self) -> float:
+        """目前已寫入的秒數"""
+        return self.frames / self.framerate if self._params else 0.0
+
+    def add_segment(self, audio_file: str) -> Tuple[float, float]:
+        """附加一段 WAV，回傳此段在整集中的開始與結束秒數"""
+        with wave.open(audio_file, "rb") as reader:
+            params = (reader.getnchannels(), reader.getsampwidth(), reader.getframerate())
+            if self._writer is None:
+                self._params = params
+                self._writer = wave.open(self.output_file, "wb")
+                self._writer.setnchannels(params[0])
+                self._writer.setsampwidth(params[1])
+                self._writer.setframerate(params[2])
+            elif params != self._params:
+                raise ValueError(f"{audio_file} 的格式 {params} 與前面的段落 {self._params} 不同")
+
+            start = self.duration
+            while True:
+                data = reader.readframes(COPY_FRAMES)
+                if not data:
+                    break
+                self._writer.writeframesraw(data)
+            self.frames += reader.getnframes()
+        return start, self.duration
+
+    def add_silence(self, duration_ms: int):
+        if self._writer is None:
+            raise ValueError("必須先加入至少一段音檔才能決定靜音的格式")
+        channels, sampwidth, framerate = self._params
+        frames = framerate * duration_ms // 1000
+        self._writer.writeframesraw(b"\x00" * (frames * channels * sampwidth))
+        self.frames += frames
+
+    def close(self):
+        if self._writer is not None:
+            # wave 模組會在關閉時回填 RIFF 與 data 區塊的長度
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def merge_wav_files(audio_files: List[str], output_file: str, gap_ms: int = 500) -> List[Tuple[float, float]]:
+    """依序串接音檔，每段之後加入 gap_ms 毫秒靜音，回傳每段的開始與結束秒數"""
+    # 沒有段落時無法決定輸出格式，也不會寫出檔案，直接回報錯誤而非留下不存在的輸出路徑
+    if not audio_files:
+        raise ValueError("沒有可合併的音檔")
+    offsets = []
+    with WavAssembler(output_file) as assembler:
+        for audio_file in audio_files:
+            offsets.append(assembler.add_segment(audio_file))
+            assembler.add_silence(gap_ms)
+    return offsets
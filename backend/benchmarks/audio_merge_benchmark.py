@@ -0,0 +1,93 @@
+"""
+比較 pydub 逐段相加與串流 WAV 組裝(merge_wav_files)合併整集音檔的耗時與峰值記憶體
+
+以合成的 24kHz 16-bit 單聲道段落模擬一集節目(預設 90 分鐘、每段約 9 秒)。
+每種方法在獨立的子行程中執行，峰值記憶體取自該行程的 ru_maxrss。
+
+用法：
+    python -m backend.benchmarks.audio_merge_benchmark [分鐘數] [每段秒數]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+FRAMERATE = 24000
+
+
+def pydub_merge(audio_files, output_file):
+    """舊版 merge_audio_files 的做法"""
+    from pydub import AudioSegment
+
+    combined = AudioSegment.empty()
+    for audio_file in audio_files:
+        combined += AudioSegment.from_wav(audio_file)
+        combined += AudioSegment.silent(duration=500)
+    combined.export(output_file, format="wav")
+
+
+def streaming_merge(audio_files, output_file):
+    from backend.audio_assembly import merge_wav_files
+
+    merge_wav_files(audio_files, output_file, gap_ms=500)
+
+
+METHODS = {"pydub": pydub_merge, "streaming": streaming_merge}
+
+
+def create_segments(directory, minutes, segment_seconds):
+    """產生總長約 minutes 分鐘的段落(內容為低音量方波，避免全為靜音)"""
+    count = int(minutes * 60 / (segment_seconds + 0.5))
+    frames = int(segment_seconds * FRAMERATE)
+    pattern = (b"\x00\x04" * 40 + b"\x00\xfc" * 40) * (frames // 80 + 1)
+    audio_files = []
+    for i in range(count):
+        path = os.path.join(directory, f"segment_{i:04d}.wav")
+        with wave.open(path, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(FRAMERATE)
+            writer.writeframes(pattern[:frames * 2])
+        audio_files.append(path)
+    return audio_files
+
+
+def run_method(method, directory):
+    """於子行程中執行：合併 directory 中的段落並印出耗時與峰值記憶體"""
+    audio_files = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.startswith("segment_")
+    )
+    output_file = os.path.join(directory, f"episode_{method}.wav")
+    start = time.perf_counter()
+    METHODS[method](audio_files, output_file)
+    elapsed = time.perf_counter() - start
+    # Linux 上 ru_maxrss 的單位為 KB
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed} {peak_mb} {os.path.getsize(output_file)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_method(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 90
+    segment_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 9
+
+    with tempfile.TemporaryDirectory() as directory:
+        audio_files = create_segments(directory, minutes, segment_seconds)
+        print(f"{len(audio_files)} 段，共約 {minutes:.0f} 分鐘")
+        for method in METHODS:
+            output = subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.audio_merge_benchmark", "--run", method, directory],
+                capture_output=True, text=True
+            )
+            if output.returncode != 0:
+                print(f"{method}: 執行失敗\n{output.stderr.strip()}")
+                continue
+            elapsed, peak_mb, size = output.stdout.strip().splitlines()[-1].split()
+            print(f"{method:10s} 耗時 {float(elapsed):7.2f}s  峰值記憶體 {float(peak_mb):8.1f} MB  "
+                  f"輸出 {int(size) / 1024 / 1024:.1f} MB")
@@ -0,0 +1,103 @@
+"""
+以 stores/references 中的摘要離線比較不同切分設定：產生的向量數、embedding 耗時與檢索命中率
+
+檢索在記憶體中以 cosine 相似度計算，不需要 Qdrant。未提供查詢檔時，從每份摘要抽樣幾個句子作為查詢，
+命中的定義為 top-k 中包含來自同一份參考資料的 chunk；提供查詢檔(JSONL，每行 {"query", "folder_name"})
+時則以實際查詢評估。
+
+用法：
+    python -m backend.benchmarks.chunking_benchmark [k] [queries.jsonl]
+"""
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from backend.database.chunking import SEPARATORS, create_token_splitter
+from backend.models.embedding import EMBEDDING_MODEL
+
+
+REFERENCES_PATH = Path(__file__).resolve().parent.parent / "stores" / "references"
+
+
+def legacy_splitter():
+    """原本以字元數計算、50% 重疊的切分器"""
+    return RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=400, separators=SEPARATORS)
+
+
+# (名稱, 建立切分器的函式)
+SETTINGS = [
+    ("chars 800 / overlap 400", legacy_splitter),
+    ("tokens 256 / overlap 32", lambda: create_token_splitter(256, 32)),
+    ("tokens 400 / overlap 60", lambda: create_token_splitter(400, 60)),
+    ("tokens 512 / overlap 64", lambda: create_token_splitter(512, 64)),
+    ("tokens 512 / overlap 0", lambda: create_token_splitter(512, 0)),
+]
+
+
+def load_summaries():
+    summaries = {}
+    for folder_path in sorted(p for p in REFERENCES_PATH.iterdir() if p.is_dir()):
+        summary_path = folder_path / f"{folder_path.name}_summary.md"
+        if summary_path.exists():
+            summaries[folder_path.name] = summary_path.read_text(encoding="utf-8")
+    return summaries
+
+
+def sample_queries(summaries, per_document: int = 3):
+    rng = random.Random(0)
+    queries = []
+    for folder_name, text in summaries.items():
+        sentences = [s.strip() for s in re.split(r"[。！？\n]", text) if len(s.strip()) >= 12]
+        for sentence in rng.sample(sentences, min(per_document, len(sentences))):
+            queries.append({"query": sentence, "folder_name": folder_name})
+    return queries
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    summaries = load_summaries()
+    if not summaries:
+        sys.exit(f"{REFERENCES_PATH} 中沒有摘要")
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = sample_queries(summaries)
+
+    # 直接使用模型，不經過向量快取，耗時才可比較
+    model = EMBEDDING_MODEL.load()
+    query_vectors = normalize(model.embed_documents([q["query"] for q in queries]))
+    print(f"{len(summaries)} 份摘要，{len(queries)} 個查詢，k={k}")
+
+    for name, create_splitter in SETTINGS:
+        splitter = create_splitter()
+        chunks, owners = [], []
+        for folder_name, text in summaries.items():
+            for chunk in splitter.split_text(text):
+                chunks.append(chunk)
+                owners.append(folder_name)
+
+        start = time.perf_counter()
+        chunk_vectors = normalize(model.embed_documents(chunks))
+        embed_seconds = time.perf_counter() - start
+
+        scores = query_vectors @ chunk_vectors.T
+        top_k = np.argsort(-scores, axis=1)[:, :k]
+        hits = sum(
+            any(owners[i] == query["folder_name"] for i in top_k[row])
+            for row, query in enumerate(queries)
+        )
+        print(f"{name:26s} 向量 {len(chunks):5d}  embedding {embed_seconds:6.2f}s  "
+              f"hit@{k} {hits / len(queries):.3f}")
@@ -0,0 +1,76 @@
+"""
+比較各 embedding 後端的文件吞吐量與並行查詢延遲，以及 embed_query 合併批次的效果
+
+文件吞吐量以批次 embed_documents 量測；查詢延遲以多個執行緒同時呼叫 embed_query 模擬平行訪談，
+分別量測直接呼叫模型與經過 MicroBatchEmbeddings 的結果。量測不經過向量快取。
+
+用法：
+    python -m backend.benchmarks.embedding_benchmark [後端,...] [並行數]
+    例如：python -m backend.benchmarks.embedding_benchmark torch,onnx,onnx-int8 8
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.models.embedding import MicroBatchEmbeddings, create_bge_m3, detect_device
+
+
+SAMPLE_TEXTS = [
+    "大型語言模型的推理成本主要來自注意力機制的計算與記憶體頻寬。",
+    "Retrieval-augmented generation combines a retriever with a generator to ground answers in documents.",
+    "量化可以在幾乎不影響準確度的情況下，將模型的記憶體需求降低為原本的四分之一。",
+    "The podcast script is generated from a research report written by several analyst personas.",
+    "混合檢索同時利用關鍵字與語意相似度，對模型名稱等專有名詞特別有效。",
+]
+
+
+def measure_documents(model, count: int = 256, batch_size: int = 32):
+    texts = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(count)]
+    start = time.perf_counter()
+    for i in range(0, count, batch_size):
+        model.embed_documents(texts[i:i + batch_size])
+    return count / (time.perf_counter() - start)
+
+
+def measure_queries(model, concurrency: int, rounds: int = 8):
+    latencies = []
+
+    def query(i):
+        start = time.perf_counter()
+        model.embed_query(f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} #{i}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(query, range(concurrency * rounds)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "qps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    device = detect_device()
+    backends = sys.argv[1].split(",") if len(sys.argv) > 1 else ["torch", "onnx", "onnx-int8"]
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"device={device}，並行查詢數={concurrency}")
+
+    for backend in backends:
+        try:
+            model = create_bge_m3(device=device, backend=backend)
+        except Exception as e:
+            print(f"{backend}: 無法載入({str(e)})")
+            continue
+        model.embed_documents(SAMPLE_TEXTS)  # 暖機
+
+        docs_per_second = measure_documents(model)
+        direct = measure_queries(model, concurrency)
+        batched = measure_queries(MicroBatchEmbeddings(model), concurrency)
+        print(f"{backend}: 文件 {docs_per_second:.1f} 段/秒")
+        for name, result in (("逐筆查詢", direct), ("合併批次", batched)):
+            print(f"  {name}：{result['qps']:.1f} qps，p50 {result['p50_ms']:.1f} ms，p95 {result['p95_ms']:.1f} ms")
@@ -0,0 +1,56 @@
+"""
+比較 PDF 兩次解析(pdf_to_markdown + pdf_to_text)、單次解析與多行程平行解析(extract_pdf)的耗時
+
+用法：
+    python -m backend.benchmarks.pdf_extraction_benchmark path/to/long.pdf [重複次數]
+"""
+import os
+import sys
+import time
+from functools import partial
+
+import pdfplumber
+
+from backend.pdf_extraction import extract_pdf, page_to_markdown
+
+
+def two_pass_extract(pdf_path):
+    """舊流程：Markdown 與純文字各自開檔並解析所有頁面"""
+    with pdfplumber.open(pdf_path) as pdf:
+        markdown = "".join(page_to_markdown(i, page.extract_text() or "") for i, page in enumerate(pdf.pages, 1))
+    with pdfplumber.open(pdf_path) as pdf:
+        text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+    return markdown, text
+
+
+def measure(fn, pdf_path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(pdf_path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    pdf_path = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    two_pass_time, (markdown, text) = measure(two_pass_extract, pdf_path, repeat)
+    single_pass_time, extraction = measure(partial(extract_pdf, workers=1), pdf_path, repeat)
+
+    assert extraction.markdown == markdown and extraction.text == text, "兩種解析結果不一致"
+
+    print(f"檔案：{pdf_path}（{extraction.page_count} 頁，取 {repeat} 次中最快者）")
+    print(f"兩次解析：{two_pass_time:.2f}s")
+    print(f"單次解析：{single_pass_time:.2f}s（{two_pass_time / single_pass_time:.2f}x）")
+
+    cpu_count = os.cpu_count() or 1
+    for workers in sorted({2, 4, 8, cpu_count}):
+        if workers > cpu_count:
+            continue
+        # 先暖機一次，行程池啟動的成本不計入
+        extract_pdf(pdf_path, workers=workers)
+        parallel_time, parallel = measure(partial(extract_pdf, workers=workers), pdf_path, repeat)
+        assert parallel.markdown == markdown and parallel.text == text, "平行解析結果不一致"
+        print(f"平行解析 {workers} 行程：{parallel_time:.2f}s（{two_pass_time / parallel_time:.2f}x）")
@@ -0,0 +1,143 @@
+"""
+以目前 documents 集合中的向量，比較不同量化/on-disk 設定的 RAM 用量估計與 recall@k
+
+每種設定都會建立一個暫時集合並寫入相同的向量，以原始集合的精確搜尋(exact=True)結果作為標準答案，
+查詢向量取自集合中隨機抽樣的 chunk。結束後刪除暫時集合。
+hybrid 模式的集合使用 named vectors：暫時集合沿用相同的 dense / sparse 配置，只比較 dense 向量的搜尋結果，
+RAM 估計也只計算 dense 向量。
+
+用法：
+    python -m backend.benchmarks.qdrant_quantization_benchmark [查詢數] [k]
+"""
+import random
+import sys
+import time
+
+from qdrant_client import models
+
+from backend.database.qdrant_manager import (
+    DENSE_VECTOR_NAME,
+    HNSW_M,
+    SPARSE_VECTOR_NAME,
+    VECTOR_SIZE,
+    get_qdrant_manager,
+    make_hnsw_config,
+    make_quantization_config,
+    make_search_params,
+)
+
+
+# (名稱, 量化方式, 原始向量是否放在磁碟, 是否重新評分)
+CONFIGS = [
+    ("float32 in RAM", "none", False, False),
+    ("float32 on disk", "none", True, False),
+    ("int8 + disk originals", "scalar", True, False),
+    ("int8 + disk originals + rescore", "scalar", True, True),
+    ("binary + disk originals", "binary", True, False),
+    ("binary + disk originals + rescore", "binary", True, True),
+]
+
+
+def load_points(client, collection_name, batch_size=256):
+    """讀出集合中所有點的 id 與向量"""
+    points, offset = [], None
+    while True:
+        batch, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=True
+        )
+        points.extend(batch)
+        if offset is None:
+            return points
+
+
+def estimate_ram_bytes(count, quantization, on_disk):
+    """估計常駐 RAM：未放在磁碟的原始向量、量化向量與 HNSW 圖的連結"""
+    ram = 0
+    if not on_disk:
+        ram += count * VECTOR_SIZE * 4
+    if quantization == "scalar":
+        ram += count * VECTOR_SIZE
+    elif quantization == "binary":
+        ram += count * VECTOR_SIZE // 8
+    ram += count * HNSW_M * 2 * 4
+    return ram
+
+
+def search_ids(client, collection_name, vector, k, search_params, using=None):
+    response = client.query_points(
+        collection_name=collection_name,
+        query=vector,
+        using=using,
+        limit=k,
+        search_params=search_params,
+        with_payload=False
+    )
+    return [point.id for point in response.points]
+
+
+if __name__ == "__main__":
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    manager = get_qdrant_manager()
+    client = manager.client
+    points = load_points(client, manager.collection_name)
+    if not points:
+        sys.exit(f"集合 {manager.collection_name} 沒有資料")
+    queries = random.Random(0).sample(points, min(query_count, len(points)))
+    print(f"語料：{len(points)} 個 chunk，查詢 {len(queries)} 次，k={k}")
+
+    # hybrid 集合的 point.vector 為 {"dense": [...], "sparse": SparseVector}
+    using = DENSE_VECTOR_NAME if manager.hybrid else None
+    query_vectors = {
+        query.id: query.vector[DENSE_VECTOR_NAME] if manager.hybrid else query.vector
+        for query in queries
+    }
+
+    ground_truth = {
+        query.id: search_ids(client, manager.collection_name, query_vectors[query.id], k,
+                             models.SearchParams(exact=True), using)
+        for query in queries
+    }
+
+    for name, quantization, on_disk, rescore in CONFIGS:
+        collection_name = f"{manager.collection_name}_bench"
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+        dense_params = models.VectorParams(size=VECTOR_SIZE, distance=models.Distance.COSINE, on_disk=on_disk)
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config={DENSE_VECTOR_NAME: dense_params} if manager.hybrid else dense_params,
+            sparse_vectors_config={SPARSE_VECTOR_NAME: models.SparseVectorParams()} if manager.hybrid else None,
+            hnsw_config=make_hnsw_config(),
+            quantization_config=make_quantization_config(quantization)
+        )
+        try:
+            for start in range(0, len(points), 256):
+                client.upsert(
+                    collection_name=collection_name,
+                    points=[
+                        models.PointStruct(id=point.id, vector=point.vector)
+                        for point in points[start:start + 256]
+                    ],
+                    wait=True
+                )
+
+            search_params = make_search_params(quantization, rescore=rescore)
+            hits, elapsed = 0, 0.0
+            for query in queries:
+                start = time.perf_counter()
+                result = search_ids(client, collection_name, query_vectors[query.id], k, search_params, using)
+                elapsed += time.perf_counter() - start
+                hits += len(set(result) & set(ground_truth[query.id]))
+
+            recall = hits / (len(queries) * k)
+            ram_mb = estimate_ram_bytes(len(points), quantization, on_disk) / 1024 / 1024
+            print(f"{name:36s} RAM 估計 {ram_mb:8.2f} MB  recall@{k} {recall:.3f}  "
+                  f"平均延遲 {elapsed / len(queries) * 1000:.1f} ms")
+        finally:
+            client.delete_collection(collection_name)
@@ -0,0 +1,41 @@
+"""
+量測後端啟動成本：匯入 backend.main 的時間(每次於新的行程中量測)，以及暖機各步驟的耗時
+
+用法：
+    python -m backend.benchmarks.startup_benchmark [重複次數]
+"""
+import subprocess
+import sys
+import time
+
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import(repeat: int):
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()
+        timings.append(float(output[-1]))
+    return timings
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    timings = measure_import(repeat)
+    print(f"匯入 backend.main：最快 {min(timings):.2f}s，平均 {sum(timings) / len(timings):.2f}s（{repeat} 次）")
+
+    from backend.warmup import warm_up
+
+    start = time.perf_counter()
+    state = warm_up()
+    print(f"暖機狀態：{state.status}，總計 {time.perf_counter() - start:.2f}s")
+    for name, seconds in state.timings.items():
+        print(f"- {name}: {seconds:.2f}s")
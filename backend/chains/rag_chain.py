@@ -1,23 +1,55 @@
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain.retrievers.document_compressors import FlashrankRerank
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain.retrievers import ContextualCompressionRetriever
 
 from backend.models.llm import LLM  
-from backend.database.qdrant_manager import QdrantManager
-from backend.models.embedding import EMBEDDING_MODEL
+from backend.database.qdrant_manager import get_qdrant_manager
+from backend.models.reranker import get_reranker
+from backend.database.query_cache import QUERY_CACHE
 
-# 初始化 Qdrant manager
-qdrant_manager = QdrantManager(EMBEDDING_MODEL)
+_compression_retriever = None
 
-vectordb = qdrant_manager.get_vectordb()
 
-# 使用 vectordb 創建檢索器
-retriever = vectordb.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 10}
-)
+def get_compression_retriever(reference_folders=None):
+    """第一次使用時才連線 Qdrant 並載入重排序模型；指定 reference_folders 時只在這些參考資料中搜尋"""
+    global _compression_retriever
+    if _compression_retriever is not None and not reference_folders:
+        return _compression_retriever
+
+    # 取得共用的 Qdrant manager 並創建檢索器
+    qdrant_manager = get_qdrant_manager()
+    retriever = qdrant_manager.get_retriever(k=10, reference_folders=reference_folders)
+
+    compressor = get_reranker(top_n=5)  # K2, Top5 Answers
+    compression_retriever = ContextualCompressionRetriever(
+        base_compressor=compressor, 
+        base_retriever=retriever
+    )
+    if not reference_folders:
+        _compression_retriever = compression_retriever
+    return compression_retriever
+
+
+def retrieve_context(question, reference_folders=None):
+    """檢索並重排序，與先前相近的問題直接沿用快取的結果"""
+    scope = ("rag", 10, 5, tuple(sorted(reference_folders or [])))
+    return QUERY_CACHE.get_or_retrieve(
+        question,
+        scope,
+        lambda query: get_compression_retriever(reference_folders).invoke(query)
+    )
+
+
+def create_rag_chain(reference_folders=None):
+    """建立只在指定參考資料中檢索的 RAG chain"""
+    return (
+        {"context": RunnableLambda(lambda question: retrieve_context(question, reference_folders)), "question": RunnablePassthrough()} 
+        | prompt 
+        | LLM 
+        | StrOutputParser()
+    )
+
 
 prompt = PromptTemplate.from_template("""
 <system instruction>
@@ -25,28 +57,16 @@ prompt = PromptTemplate.from_template("""
 Question: {question}
 Helpful Answer:""")
 
-RERANK_MODEL = 'ms-marco-MultiBERT-L-12'
-
-compressor = FlashrankRerank(model=RERANK_MODEL, top_n=5)  # K2, Top5 Answers
-compression_retriever = ContextualCompressionRetriever(
-    base_compressor=compressor, 
-    base_retriever=retriever
-)
-
-rag_chain = (
-    {"context": compression_retriever, "question": RunnablePassthrough()} 
-    | prompt 
-    | LLM 
-    | StrOutputParser()
-)
+rag_chain = create_rag_chain()
 
 
 if __name__ == "__main__":
 
+    qdrant_manager = get_qdrant_manager()
     qdrant_manager.clear_collection()
     text = open(r"C:\Users\k123k\Desktop\podgen\backend\test.txt", "r", encoding="utf-8").read()
     qdrant_manager.split_and_add_text(text)
     
     question = "什麼是COWOS"
-    search_result = compression_retriever.invoke(question)
+    search_result = get_compression_retriever().invoke(question)
     print(search_result)
\ No newline at end of file
@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+load_dotenv()
+
+TOKENIZER_NAME = 'BAAI/bge-m3'
+
+# 以 BGE-M3 token 計算的預設 chunk 大小與重疊，可用 QDRANT_CHUNK_SETTINGS 依集合覆寫，例如：
+# QDRANT_CHUNK_SETTINGS='{"documents": {"chunk_size": 384, "chunk_overlap": 48}}'
+DEFAULT_CHUNK_TOKENS = int(os.getenv("QDRANT_CHUNK_TOKENS", "400"))
+DEFAULT_CHUNK_OVERLAP = int(os.getenv("QDRANT_CHUNK_OVERLAP", "60"))
+CHUNK_SETTINGS: Dict[str, Dict[str, int]] = json.loads(os.getenv("QDRANT_CHUNK_SETTINGS", "{}"))
+
+# 依序嘗試的切分點：段落、換行、中英文句尾、子句，最後才是詞與字元
+SEPARATORS = [
+    "\n\n",
+    "\n",
+    "\u3002",  # Ideographic full stop
+    "\uff01",  # Fullwidth exclamation mark
+    "\uff1f",  # Fullwidth question mark
+    "\uff0e",  # Fullwidth full stop
+    ". ",
+    "\uff1b",  # Fullwidth semicolon
+    "\uff0c",  # Fullwidth comma
+    "\u3001",  # Ideographic comma
+    ", ",
+    " ",
+    "\u200b",  # Zero-width space
+    "",
+]
+
+_tokenizer = None
+_splitters: Dict[Tuple[int, int], RecursiveCharacterTextSplitter] = {}
+_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """第一次使用時才載入 BGE-M3 的 tokenizer(只有 tokenizer，不載入模型)"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _lock:
+            if _tokenizer is None:
+                from transformers import AutoTokenizer
+
+                _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+    return _tokenizer
+
+
+def chunk_settings(collection_name: str) -> Tuple[int, int]:
+    settings = CHUNK_SETTINGS.get(collection_name, {})
+    return (
+        int(settings.get("chunk_size", DEFAULT_CHUNK_TOKENS)),
+        int(settings.get("chunk_overlap", DEFAULT_CHUNK_OVERLAP)),
+    )
+
+
+def create_token_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """以 BGE-M3 token 數計算長度的切分器，標點保留在前一句句尾"""
+    tokenizer = get_tokenizer()
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=lambda text: len(tokenizer.encode(text, add_special_tokens=False)),
+        is_separator_regex=False,
+        keep_separator="end",
+        separators=SEPARATORS,
+    )
+
+
+def get_text_splitter(collection_name: str) -> RecursiveCharacterTextSplitter:
+    """取得集合對應的切分器，相同設定的集合共用同一個"""
+    key = chunk_settings(collection_name)
+    if key not in _splitters:
+        splitter = create_token_splitter(*key)
+        with _lock:
+            _splitters.setdefault(key, splitter)
+    return _splitters[key]
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = BACKEND_DIR / "stores" / "embedding_cache.db"
+
+
+def normalize_text(text: str) -> str:
+    """統一 Unicode 表示法並合併空白，只差在空白或全半形的文字會共用同一個向量"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+# 命中時不立即寫回最後存取時間，累積到一定數量或間隔才批次更新，讀取路徑不必每次開寫入交易
+ACCESS_FLUSH_SIZE = 512
+ACCESS_FLUSH_INTERVAL = 30
+
+
+class EmbeddingCache:
+    """
+    以 SQLite 保存的向量快取，鍵為 (模型, 用途, 標準化文字) 的雜湊，超過容量時依最後使用時間淘汰
+
+    多個 worker 共用同一個資料庫檔案：使用 WAL 模式讓讀取不阻擋寫入，並設定鎖定等待時間。
+    總大小由觸發器維護在 embedding_cache_stats 中，不必每次寫入都掃描整個資料表。
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_bytes: int = 1024 * 1024 * 1024,
+                 low_water: float = 0.9):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending_access: Dict[str, float] = {}
+        self._last_flush = time.time()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embedding_cache_accessed ON embedding_cache (accessed_at)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS embedding_cache_insert AFTER INSERT ON embedding_cache
+                BEGIN
+                    UPDATE embedding_cache_stats
+                    SET entries = entries + 1, size_bytes = size_bytes + LENGTH(NEW.vector) WHERE id = 0;
+                END
+            """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS embedding_cache_delete AFTER DELETE ON embedding_cache
+                BEGIN
+                    UPDATE embedding_cache_stats
+                    SET entries = entries - 1, size_bytes = size_bytes - LENGTH(OLD.vector) WHERE id = 0;
+                END
+            """)
+            # 既有的資料庫只在第一次建立統計列時掃描一次
+            self._conn.execute("""
+                INSERT OR IGNORE INTO embedding_cache_stats (id, entries, size_bytes)
+                SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embedding_cache
+            """)
+
+    @staticmethod
+    def make_key(model_id: str, kind: str, text: str) -> str:
+        data = f"{model_id}\0{kind}\0{normalize_text(text)}"
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """一次查詢多個鍵，回傳命中的向量"""
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            # SQLite 預設最多 999 個參數，分批查詢
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, blob in self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", batch
+                ):
+                    found[key] = array("f", blob).tolist()
+            for key in found:
+                self._pending_access[key] = now
+            if (len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                    or now - self._last_flush >= ACCESS_FLUSH_INTERVAL):
+                self._flush_access()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                # 相同的鍵代表相同的模型與文字，向量不會改變，已存在時保留原本的資料列
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embedding_cache (key, vector, accessed_at) VALUES (?, ?, ?)",
+                    [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+                )
+            self._evict()
+
+    def _flush_access(self):
+        """將累積的最後存取時間寫回資料庫(呼叫者需持有鎖)"""
+        if self._pending_access:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+                )
+            self._pending_access.clear()
+        self._last_flush = time.time()
+
+    def _size(self):
+        return self._conn.execute(
+            "SELECT entries, size_bytes FROM embedding_cache_stats WHERE id = 0"
+        ).fetchone() or (0, 0)
+
+    def _evict(self):
+        """總大小超過上限時，依最後存取時間淘汰直到低於低水位(呼叫者需持有鎖)"""
+        count, total = self._size()
+        if total <= self.max_bytes or not count:
+            return
+        # 先寫回最近的存取時間，剛命中的向量才不會被淘汰
+        self._flush_access()
+        overflow = int(count * (total - self.max_bytes * self.low_water) / total) + 1
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, total = self._size()
+        return {
+            "entries": count,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+EMBEDDING_CACHE = EmbeddingCache(
+    db_path=os.getenv("EMBEDDING_CACHE_PATH", str(DEFAULT_DB_PATH)),
+    max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024
+)
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from backend.database.file_lru import FileLRU
+from backend.database.reference_catalog import file_sha256
+from backend.pdf_extraction import EXTRACTOR_VERSION, PdfExtraction, extract_pdf
+
+load_dotenv()
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_DIR = BACKEND_DIR / "stores" / "extraction_cache"
+
+
+class ExtractionCache:
+    """PDF 解析結果的磁碟快取，以內容雜湊與解析器版本為鍵，超過容量時依最後使用時間淘汰"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024,
+                 version: str = EXTRACTOR_VERSION):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._store = FileLRU(self.cache_dir, "*.json", max_bytes)
+
+    def _entry_path(self, sha256: str) -> Path:
+        return self.cache_dir / f"{sha256}_{self.version}.json"
+
+    def get(self, sha256: str) -> Optional[PdfExtraction]:
+        path = self._entry_path(sha256)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        self._store.touch(path)
+        with self._lock:
+            self.hits += 1
+        return PdfExtraction(data["markdown"], data["text"], data["pages"])
+
+    def put(self, sha256: str, extraction: PdfExtraction):
+        data = {
+            "markdown": extraction.markdown,
+            "text": extraction.text,
+            "pages": extraction.pages,
+        }
+        self._store.write(self._entry_path(sha256), json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def get_or_extract(self, pdf_path, sha256: Optional[str] = None) -> PdfExtraction:
+        """先查快取，未命中才以 pdfplumber 解析並寫入快取"""
+        sha256 = sha256 or file_sha256(Path(pdf_path))
+        extraction = self.get(sha256)
+        if extraction is None:
+            extraction = extract_pdf(pdf_path)
+            self.put(sha256, extraction)
+        return extraction
+
+    def stats(self) -> Dict:
+        entries = list(self.cache_dir.glob("*.json"))
+        return {
+            "version": self.version,
+            "entries": len(entries),
+            "size_bytes": sum(p.stat().st_size for p in entries if p.exists()),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+EXTRACTION_CACHE = ExtractionCache(
+    cache_dir=os.getenv("EXTRACTION_CACHE_DIR", str(DEFAULT_CACHE_DIR)),
+    max_bytes=int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+)
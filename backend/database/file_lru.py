@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+
+def atomic_write(path: Path, data: bytes):
+    """先寫入同目錄的暫存檔再搬移，讀取端不會看到寫到一半的檔案"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class FileLRU:
+    """
+    以檔案修改時間作為 LRU 依據的目錄容量管理
+
+    總大小超過 max_bytes 時，由最久未使用的檔案開始刪除，直到低於 max_bytes * low_water，
+    之後的寫入累積到上限才需要再次掃描目錄。pin() 標記的檔案(例如進行中的工作正在使用)不會被刪除。
+    """
+
+    def __init__(self, root, pattern: str, max_bytes: int, low_water: float = 0.9,
+                 recursive: bool = False, on_remove: Optional[Callable[[Path], None]] = None):
+        self.root = Path(root)
+        self.pattern = pattern
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.recursive = recursive
+        self.on_remove = on_remove
+        self._lock = threading.Lock()
+        self._pins = Counter()
+        # 上次掃描時的目錄大小加上之後寫入的量；超過上限時才重新掃描整個目錄
+        self._estimated_bytes = None
+
+    def files(self) -> Iterable[Path]:
+        return self.root.rglob(self.pattern) if self.recursive else self.root.glob(self.pattern)
+
+    def touch(self, path: Path) -> bool:
+        """更新修改時間作為 LRU 依據，檔案不存在時回傳 False"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def write(self, path: Path, data: bytes):
+        atomic_write(path, data)
+        with self._lock:
+            if self._estimated_bytes is not None:
+                self._estimated_bytes += len(data)
+            needs_scan = self._estimated_bytes is None or self._estimated_bytes > self.max_bytes
+        if needs_scan:
+            self.evict()
+
+    def pin(self, paths: Iterable[Path]):
+        with self._lock:
+            self._pins.update(Path(p) for p in paths)
+
+    def unpin(self, paths: Iterable[Path]):
+        with self._lock:
+            self._pins.subtract(Path(p) for p in paths)
+            self._pins = +self._pins
+
+    def evict(self):
+        """總大小超過上限時，刪除最久未使用且未被 pin 的檔案，直到低於低水位"""
+        with self._lock:
+            entries = []
+            for path in self.files():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = self.max_bytes * self.low_water
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    if path in self._pins:
+                        continue
+                    path.unlink(missing_ok=True)
+                    total -= size
+                    if self.on_remove:
+                        self.on_remove(path)
+            self._estimated_bytes = total
@@ -1,121 +1,460 @@
-from langchain_qdrant import QdrantVectorStore
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
 from qdrant_client import QdrantClient, models
 from qdrant_client.models import Distance, VectorParams
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from dotenv import load_dotenv
+import hashlib
+from collections import Counter
 import os
+from datetime import datetime
+import threading
+import uuid
 
-from backend.models.embedding import EMBEDDING_MODEL
+from backend.models.embedding import EMBEDDING_MODEL, RETRIEVAL_MODE, SPARSE_EMBEDDING_MODEL
+from backend.database.chunking import get_text_splitter
+from backend.database.query_cache import QUERY_CACHE
 
 load_dotenv()
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=800,
-    chunk_overlap=400,
-    length_function=len,
-    is_separator_regex=False,
-    separators=[
-        "\n\n",
-        "\n",
-        " ",
-        ".",
-        ",",
-        "\u200b",  # Zero-width space
-        "\uff0c",  # Fullwidth comma
-        "\u3001",  # Ideographic comma
-        "\uff0e",  # Fullwidth full stop
-        "\u3002",  # Ideographic full stop
-        "",
-    ],
+# 每批 embedding 與 upsert 的 chunk 數量
+UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "64"))
+
+# 需要建立 keyword payload index 的欄位，刪除與過濾檢索時不必掃描整個集合
+PAYLOAD_INDEX_FIELDS = (
+    "metadata.folder_name",
+    "metadata.source_type",
+    "metadata.upload_date",
 )
 
+# hybrid 使用 named vectors，無法由舊的單一向量集合就地轉換，因此寫入另一個集合
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "documents_hybrid" if RETRIEVAL_MODE == "hybrid" else "documents")
+DENSE_VECTOR_NAME = "dense"
+SPARSE_VECTOR_NAME = "sparse"
+
+# 向量儲存設定：原始 float32 向量放在磁碟，RAM 中只保留量化後的向量，檢索時以原始向量重新評分
+VECTOR_SIZE = 1024  # BGE-M3 的向量維度
+QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "scalar").lower()  # none / scalar / binary
+VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "true").lower() == "true"
+HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+SEARCH_HNSW_EF = int(os.getenv("QDRANT_SEARCH_HNSW_EF", "128"))
+SEARCH_RESCORE = os.getenv("QDRANT_SEARCH_RESCORE", "true").lower() == "true"
+SEARCH_OVERSAMPLING = float(os.getenv("QDRANT_SEARCH_OVERSAMPLING", "2.0"))
+
+
+def make_quantization_config(quantization: str = QUANTIZATION):
+    """依設定建立量化參數，量化後的向量固定保留在 RAM 中"""
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    if quantization == "none":
+        return None
+    raise ValueError(f"不支援的量化方式：{quantization}")
+
+
+def make_hnsw_config(m: int = HNSW_M, ef_construct: int = HNSW_EF_CONSTRUCT):
+    return models.HnswConfigDiff(m=m, ef_construct=ef_construct)
+
+
+def make_search_params(quantization: str = QUANTIZATION, hnsw_ef: int = SEARCH_HNSW_EF,
+                       rescore: bool = SEARCH_RESCORE, oversampling: float = SEARCH_OVERSAMPLING):
+    """檢索參數：量化集合先以量化向量多取 oversampling 倍的候選，再以原始向量重新評分"""
+    if quantization == "none":
+        return models.SearchParams(hnsw_ef=hnsw_ef)
+    return models.SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=models.QuantizationSearchParams(
+            rescore=rescore,
+            oversampling=oversampling
+        )
+    )
+
+# 產生固定 point id 用的命名空間
+POINT_ID_NAMESPACE = uuid.UUID("6f1c9f0e-2b8a-4d2c-9a7e-3c5d8e1f4b20")
+
+
+def make_point_id(folder_name: str, text: str, occurrence: int = 0) -> str:
+    """
+    由 (資料夾名稱, chunk 內容雜湊, 同內容的第幾次出現) 產生固定的 point id
+
+    不包含 chunk 序號：文件中間插入或刪除段落時，其後的 chunk 仍保有原本的 id，不必重新計算向量。
+    """
+    chunk_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{folder_name}:{chunk_hash}:{occurrence}"))
 
 
 class QdrantManager:
-    def __init__(self, embedding_model):
-        # Qdrant Cloud 設定
+    def __init__(self, embedding_model, sparse_embedding_model=None, retrieval_mode=RETRIEVAL_MODE):
+        # Qdrant Cloud 設定：單一 client 內部維護 gRPC channel 與 HTTP 連線池，可在多執行緒間共用
         self.client = QdrantClient(
             url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
+            api_key=os.getenv("QDRANT_API_KEY"),
+            prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
         )
+        if retrieval_mode not in ("dense", "hybrid"):
+            raise ValueError(f"不支援的檢索模式：{retrieval_mode}")
         self.embedding_model = embedding_model
-        self.collection_name = "documents"
+        self.sparse_embedding_model = sparse_embedding_model
+        self.hybrid = retrieval_mode == "hybrid"
+        if self.hybrid and sparse_embedding_model is None:
+            raise ValueError("hybrid 模式需要 sparse embedding 模型")
+        self.collection_name = COLLECTION_NAME
+        # dense 模式沿用舊集合的未命名向量，hybrid 模式使用 named vectors
+        self.dense_vector_name = DENSE_VECTOR_NAME if self.hybrid else ""
         
-        # 確保集合存在
+        # 確保集合與 payload index 存在
         self._ensure_collection()
+        self._ensure_payload_indexes()
+
+        # 既有集合的設定與目前不同時只提示，遷移需明確執行(會觸發背景重建索引)
+        drift = self.vector_config_drift()
+        if drift:
+            print(f"集合 {self.collection_name} 的向量設定與目前設定不同：{drift}，"
+                  f"請執行 python -m backend.database.qdrant_manager migrate")
+
+        # 所有讀寫共用同一個 vector store，不再為每次寫入另開連線
+        if self.hybrid:
+            self.vectordb = QdrantVectorStore(
+                client=self.client,
+                collection_name=self.collection_name,
+                embedding=self.embedding_model,
+                sparse_embedding=self.sparse_embedding_model,
+                retrieval_mode=RetrievalMode.HYBRID,
+                vector_name=DENSE_VECTOR_NAME,
+                sparse_vector_name=SPARSE_VECTOR_NAME,
+            )
+        else:
+            self.vectordb = QdrantVectorStore(
+                client=self.client,
+                collection_name=self.collection_name,
+                embedding=self.embedding_model,
+            )
     
+    @property
+    def text_splitter(self):
+        """依集合設定、以 BGE-M3 token 計算長度的切分器，第一次寫入時才載入 tokenizer"""
+        return get_text_splitter(self.collection_name)
+
     def _ensure_collection(self):
-        """確保集合存在，如果不存在就建立"""
-        collections = self.client.get_collections().collections
-        exists = any(col.name == self.collection_name for col in collections)
-        
-        if not exists:
+        """確保集合存在，如果不存在就依目前的量化與 HNSW 設定建立"""
+        if not self.client.collection_exists(self.collection_name):
+            dense_params = VectorParams(
+                size=VECTOR_SIZE,
+                distance=Distance.COSINE,
+                on_disk=VECTORS_ON_DISK
+            )
+            if self.hybrid:
+                vectors_config = {DENSE_VECTOR_NAME: dense_params}
+                sparse_vectors_config = {
+                    SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                        index=models.SparseIndexParams(on_disk=VECTORS_ON_DISK)
+                    )
+                }
+            else:
+                vectors_config = dense_params
+                sparse_vectors_config = None
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=1024,  # BGE-M3 的向量維度
-                    distance=Distance.COSINE
-                )
+                vectors_config=vectors_config,
+                sparse_vectors_config=sparse_vectors_config,
+                hnsw_config=make_hnsw_config(),
+                quantization_config=make_quantization_config()
             )
     
-    def split_and_add_text(self, docs):
-        texts = text_splitter.split_text(docs)
-        return QdrantVectorStore.from_documents(
-            documents=[Document(page_content=t) for t in texts],
-            embedding=self.embedding_model,
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY"),
+    def vector_config_drift(self):
+        """比較既有集合與目前設定，回傳不一致的項目(空 dict 表示不需遷移)"""
+        config = self.client.get_collection(self.collection_name).config
+        quantization = config.quantization_config
+        if isinstance(quantization, models.ScalarQuantization):
+            current_quantization = "scalar"
+        elif isinstance(quantization, models.BinaryQuantization):
+            current_quantization = "binary"
+        else:
+            current_quantization = "none"
+
+        vectors = config.params.vectors
+        if isinstance(vectors, dict):
+            vectors = vectors[self.dense_vector_name]
+
+        current = {
+            "quantization": current_quantization,
+            "on_disk": bool(vectors.on_disk),
+            "hnsw_m": config.hnsw_config.m,
+            "hnsw_ef_construct": config.hnsw_config.ef_construct,
+        }
+        wanted = {
+            "quantization": QUANTIZATION,
+            "on_disk": VECTORS_ON_DISK,
+            "hnsw_m": HNSW_M,
+            "hnsw_ef_construct": HNSW_EF_CONSTRUCT,
+        }
+        return {key: (current[key], wanted[key]) for key in wanted if current[key] != wanted[key]}
+
+    def migrate_vector_config(self):
+        """
+        將既有集合就地更新為目前的量化、on-disk 與 HNSW 設定
+
+        Qdrant 會在背景重建量化向量與索引，期間集合仍可讀寫，不需要重新 embedding。
+
+        Returns:
+            更新前後不一致的設定項目
+        """
+        drift = self.vector_config_drift()
+        if not drift:
+            return drift
+
+        quantization_config = make_quantization_config()
+        self.client.update_collection(
             collection_name=self.collection_name,
-            prefer_grpc=True
+            vectors_config={self.dense_vector_name: models.VectorParamsDiff(on_disk=VECTORS_ON_DISK)},
+            hnsw_config=make_hnsw_config(),
+            quantization_config=quantization_config or models.Disabled.DISABLED
         )
+        print(f"已更新集合 {self.collection_name} 的向量設定：{drift}")
+        return drift
+    
+    def _ensure_payload_indexes(self):
+        """為常用的過濾欄位建立 keyword payload index(已存在的不重複建立)"""
+        payload_schema = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field_name in PAYLOAD_INDEX_FIELDS:
+            if field_name not in payload_schema:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=models.PayloadSchemaType.KEYWORD,
+                    wait=True
+                )
+    
+    def split_and_add_text(self, docs):
+        texts = self.text_splitter.split_text(docs)
+        self.vectordb.add_documents([Document(page_content=t) for t in texts])
+        return self.vectordb
     
     def get_vectordb(self):
-        return QdrantVectorStore(
-            client=self.client,
-            collection_name=self.collection_name,
-            embedding=self.embedding_model,
+        return self.vectordb
+    
+    def get_retriever(self, k, reference_folders=None):
+        """建立檢索器，指定 reference_folders 時只在這些參考資料中搜尋"""
+        search_kwargs = {"k": k, "search_params": make_search_params()}
+        if reference_folders:
+            search_kwargs["filter"] = models.Filter(must=[
+                models.FieldCondition(
+                    key="metadata.folder_name",
+                    match=models.MatchAny(any=list(reference_folders))
+                )
+            ])
+        return self.vectordb.as_retriever(
+            search_type="similarity",
+            search_kwargs=search_kwargs
         )
     
     def clear_collection(self):
         self.client.delete_collection(self.collection_name)
         self._ensure_collection()
+        self._ensure_payload_indexes()
 
-    def split_and_add_summary(self, summary_md, folder_name):
-        texts = text_splitter.split_text(summary_md)
-        return QdrantVectorStore.from_documents(
-            documents=[Document(page_content=t, metadata={"folder_name": folder_name}) for t in texts],
-            embedding=self.embedding_model,
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY"),
-            collection_name=self.collection_name,
-            prefer_grpc=True
-        )
+    def split_and_add_summary(self, summary_md, folder_name, upload_date=None):
+        texts = self.text_splitter.split_text(summary_md)
+        return self.upsert_chunks(texts, folder_name, metadata={
+            "source_type": "summary",
+            "upload_date": upload_date or datetime.now().strftime("%Y-%m-%d")
+        })
+
+    def _folder_filter(self, folder_name):
+        return models.Filter(must=[
+            models.FieldCondition(
+                key="metadata.folder_name",
+                match=models.MatchValue(value=folder_name)
+            )
+        ])
+
+    def get_chunk_indexes(self, folder_name):
+        """列出某個參考資料資料夾目前在集合中的 point id 與其 chunk 序號"""
+        chunk_indexes, offset = {}, None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._folder_filter(folder_name),
+                limit=1000,
+                offset=offset,
+                with_payload=["metadata.chunk_index"],
+                with_vectors=False
+            )
+            for point in points:
+                chunk_indexes[str(point.id)] = (point.payload or {}).get("metadata", {}).get("chunk_index")
+            if offset is None:
+                return chunk_indexes
+
+    def upsert_chunks(self, texts, folder_name, metadata=None, batch_size=None):
+        """
+        以固定 point id 冪等地寫入參考資料的 chunks
+
+        只為集合中尚不存在的 chunk 計算 embedding，並移除已不屬於這份內容的舊 chunk，
+        因此重新寫入相同內容不會有任何動作，內容修改時只處理差異。point id 以 chunk 內容決定，
+        位置改變(例如前面插入了段落)的 chunk 只更新 payload 中的 chunk_index，不重新計算向量。
+        每批 embedding 完成後以 wait=False 送出 upsert，讓伺服器寫入與下一批 embedding 同時進行，
+        最後一個請求才等待完成。
+
+        Args:
+            texts: 依序排列的 chunk 內容
+            folder_name: 參考資料資料夾名稱
+            metadata: 附加在每個 chunk 上的 metadata(例如 source_type、upload_date)
+            batch_size: 每批 embedding 與 upsert 的 chunk 數量
+
+        Returns:
+            新增、刪除、未變更(其中位置改變)的 chunk 數量
+        """
+        batch_size = batch_size or UPSERT_BATCH_SIZE
+        wanted, occurrences = {}, Counter()
+        for i, text in enumerate(texts):
+            # 同一份文件中內容相同的 chunk 依出現順序區分
+            wanted[make_point_id(folder_name, text, occurrences[text])] = (i, text)
+            occurrences[text] += 1
+        existing = self.get_chunk_indexes(folder_name)
+        new_ids = [point_id for point_id in wanted if point_id not in existing]
+        stale_ids = [point_id for point_id in existing if point_id not in wanted]
+        moved = {
+            point_id: index for point_id, (index, _) in wanted.items()
+            if point_id in existing and existing[point_id] != index
+        }
+
+        for start in range(0, len(new_ids), batch_size):
+            batch_ids = new_ids[start:start + batch_size]
+            batch_texts = [wanted[point_id][1] for point_id in batch_ids]
+            vectors = self.embed_documents(batch_texts)
+            is_last = start + batch_size >= len(new_ids) and not stale_ids and not moved
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    models.PointStruct(
+                        id=point_id,
+                        vector=vector,
+                        payload={
+                            # 與 QdrantVectorStore 的 payload 格式一致，檢索時可直接還原為 Document
+                            "page_content": text,
+                            "metadata": {
+                                **(metadata or {}),
+                                "folder_name": folder_name,
+                                "chunk_index": wanted[point_id][0]
+                            }
+                        }
+                    )
+                    for point_id, text, vector in zip(batch_ids, batch_texts, vectors)
+                ],
+                wait=is_last
+            )
+
+        if moved:
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    models.SetPayloadOperation(set_payload=models.SetPayload(
+                        payload={"chunk_index": index}, points=[point_id], key="metadata"
+                    ))
+                    for point_id, index in moved.items()
+                ],
+                wait=not stale_ids
+            )
+
+        if stale_ids:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=stale_ids),
+                wait=True
+            )
+
+        # 內容有變動時，快取的檢索結果可能已過時
+        if new_ids or stale_ids:
+            QUERY_CACHE.invalidate()
+
+        return {
+            "added": len(new_ids),
+            "deleted": len(stale_ids),
+            "unchanged": len(wanted) - len(new_ids),
+            "moved": len(moved)
+        }
     
+    def embed_documents(self, texts):
+        """計算寫入用的向量；hybrid 模式同時附上 sparse 權重"""
+        dense_vectors = self.embedding_model.embed_documents(texts)
+        if not self.hybrid:
+            return dense_vectors
+        sparse_vectors = self.sparse_embedding_model.embed_documents(texts)
+        return [
+            {
+                DENSE_VECTOR_NAME: dense,
+                SPARSE_VECTOR_NAME: models.SparseVector(indices=sparse.indices, values=sparse.values)
+            }
+            for dense, sparse in zip(dense_vectors, sparse_vectors)
+        ]
+
+    def reindex_summaries(self, references_path):
+        """將 references 資料夾中的所有摘要寫入目前的集合(例如切換到 hybrid 集合後重建索引)"""
+        results = {}
+        for folder_path in sorted(p for p in references_path.iterdir() if p.is_dir()):
+            summary_path = folder_path / f"{folder_path.name}_summary.md"
+            if summary_path.exists():
+                results[folder_path.name] = self.split_and_add_summary(
+                    summary_path.read_text(encoding="utf-8"),
+                    folder_path.name,
+                    upload_date=datetime.fromtimestamp(folder_path.stat().st_ctime).strftime("%Y-%m-%d")
+                )
+        return results
+
     # Delete summary from vector database(metadata = folder_name)
     def delete_summary(self, folder_name):
-        metadata_filter = {
-            "must": [
-                {
-                    "key": "metadata.folder_name",
-                    "match": {
-                        "value": folder_name
-                    }
-                }
-            ]
-        }
-
         self.client.delete(
             collection_name=self.collection_name,
             points_selector=models.FilterSelector(
-                filter=metadata_filter
+                filter=self._folder_filter(folder_name)
             )
         )
+        QUERY_CACHE.invalidate()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_qdrant_manager() -> QdrantManager:
+    """取得行程共用的 QdrantManager，第一次呼叫時才連線並檢查集合"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = QdrantManager(EMBEDDING_MODEL, SPARSE_EMBEDDING_MODEL)
+    return _manager
 
 
 if __name__ == "__main__":
+    import sys
+
+    qdrant_manager = QdrantManager(EMBEDDING_MODEL, SPARSE_EMBEDDING_MODEL)
+
+    # 將既有集合遷移為目前的量化/HNSW 設定：python -m backend.database.qdrant_manager migrate
+    if sys.argv[1:] == ["migrate"]:
+        drift = qdrant_manager.migrate_vector_config()
+        print(drift or "集合設定已是最新")
+        sys.exit(0)
+
+    # 由磁碟上的摘要重建目前集合(切換到 hybrid 時使用)：python -m backend.database.qdrant_manager reindex
+    if sys.argv[1:] == ["reindex"]:
+        from pathlib import Path
+
+        references_path = Path(__file__).resolve().parent.parent / "stores" / "references"
+        for folder_name, result in qdrant_manager.reindex_summaries(references_path).items():
+            print(folder_name, result)
+        sys.exit(0)
 
-    qdrant_manager = QdrantManager(EMBEDDING_MODEL)
     # qdrant_manager.clear_collection()
     
     # # Add summary to vector database(metadata = folder_name)
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from backend.models.embedding import EMBEDDING_MODEL
+
+load_dotenv()
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# 向量資料異動時更新此檔案的修改時間，讓其他 worker 的查詢快取也一併失效
+DEFAULT_VERSION_PATH = BACKEND_DIR / "stores" / "query_cache.version"
+
+
+class SemanticQueryCache:
+    """
+    以查詢向量為鍵的檢索結果快取
+
+    新查詢與同一範圍(檢索參數、參考資料過濾)內已快取查詢的 cosine 相似度超過門檻時，直接回傳當時重排序後的文件。
+    快取只存在記憶體中；向量資料庫有新增或刪除時由 invalidate() 清空。
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600, max_entries: int = 2048,
+                 version_path=DEFAULT_VERSION_PATH):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_path = Path(version_path)
+        self.version_path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Hashable, List[tuple]] = {}  # scope -> [(向量, 文件, 建立時間)]
+        self._count = 0
+        self._version = self._read_version()
+        # 每次清空快取時遞增；檢索期間若有變動，檢索結果不寫入快取
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _read_version(self) -> float:
+        try:
+            return self.version_path.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _check_version(self):
+        """其他行程更新過向量資料時清空快取(呼叫者需持有鎖)"""
+        version = self._read_version()
+        if version != self._version:
+            self._entries.clear()
+            self._count = 0
+            self._version = version
+            self._generation += 1
+
+    def generation(self) -> int:
+        """目前的快取世代，檢索前取得並傳給 put()"""
+        with self._lock:
+            self._check_version()
+            return self._generation
+
+    def get(self, query_vector, scope: Hashable) -> Optional[List[Document]]:
+        vector = normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            entries = [e for e in self._entries.get(scope, []) if now - e[2] <= self.ttl]
+            if scope in self._entries:
+                self._count -= len(self._entries[scope]) - len(entries)
+                self._entries[scope] = entries
+            if entries:
+                similarities = np.stack([e[0] for e in entries]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return list(entries[best][1])
+            self.misses += 1
+        return None
+
+    def put(self, query_vector, scope: Hashable, documents: List[Document],
+            generation: Optional[int] = None):
+        """寫入快取；generation 與目前世代不同時表示檢索期間資料已異動，直接捨棄"""
+        with self._lock:
+            self._check_version()
+            if generation is not None and generation != self._generation:
+                return
+            self._entries.setdefault(scope, []).append((normalize(query_vector), list(documents), time.time()))
+            self._count += 1
+            # 超過上限時移除最舊的項目
+            while self._count > self.max_entries:
+                oldest_scope = min(
+                    (s for s in self._entries if self._entries[s]),
+                    key=lambda s: self._entries[s][0][2]
+                )
+                self._entries[oldest_scope].pop(0)
+                self._count -= 1
+
+    def get_or_retrieve(self, query: str, scope: Hashable,
+                        retrieve: Callable[[str], List[Document]]) -> List[Document]:
+        """先以查詢向量查快取，未命中才實際檢索並寫入快取"""
+        query_vector = EMBEDDING_MODEL.embed_query(query)
+        generation = self.generation()
+        documents = self.get(query_vector, scope)
+        if documents is None:
+            documents = retrieve(query)
+            self.put(query_vector, scope, documents, generation)
+        return documents
+
+    def invalidate(self):
+        """向量資料異動後呼叫：清空本行程的快取，並通知其他行程"""
+        self.version_path.touch()
+        with self._lock:
+            self._entries.clear()
+            self._count = 0
+            self._version = self._read_version()
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+QUERY_CACHE = SemanticQueryCache(
+    threshold=float(os.getenv("QUERY_CACHE_THRESHOLD", "0.95")),
+    ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+)
@@ -0,0 +1,167 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+SORTABLE_COLUMNS = ("created_at", "title", "original_filename", "file_size")
+SUMMARY_STATUSES = ("pending", "completed", "failed")
+
+
+class ReferenceCatalog:
+    """以 SQLite 維護的參考資料目錄，記錄每個參考資料資料夾的中繼資料與 PDF 內容雜湊"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reference_catalog (
+                    folder_name TEXT PRIMARY KEY,
+                    title TEXT NOT NULL DEFAULT '',
+                    original_filename TEXT NOT NULL DEFAULT '',
+                    file_size INTEGER NOT NULL DEFAULT 0,
+                    sha256 TEXT,
+                    summary_status TEXT NOT NULL DEFAULT 'pending',
+                    created_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_reference_catalog_sha256 ON reference_catalog (sha256)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_reference_catalog_created ON reference_catalog (created_at)"
+            )
+
+    def add(self, folder_name: str, title: str, original_filename: str, file_size: int,
+            sha256: Optional[str], summary_status: str = "pending", created_at: Optional[str] = None):
+        """登錄參考資料"""
+        created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reference_catalog "
+                "(folder_name, title, original_filename, file_size, sha256, summary_status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (folder_name, title, original_filename, file_size, sha256, summary_status, created_at)
+            )
+
+    def set_summary_status(self, folder_name: str, summary_status: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE reference_catalog SET summary_status = ? WHERE folder_name = ?",
+                (summary_status, folder_name)
+            )
+
+    def remove(self, folder_name: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM reference_catalog WHERE folder_name = ?", (folder_name,)
+            )
+
+    def get(self, folder_name: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM reference_catalog WHERE folder_name = ?", (folder_name,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_hash(self, sha256: str) -> Optional[Dict]:
+        """依 PDF 內容雜湊查詢已完成摘要的參考資料"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM reference_catalog WHERE sha256 = ? AND summary_status = 'completed' "
+                "ORDER BY created_at DESC LIMIT 1",
+                (sha256,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list(self, page: int = 1, page_size: Optional[int] = None, sort_by: str = "created_at",
+             descending: bool = True, query: Optional[str] = None,
+             summary_status: Optional[str] = None) -> Dict:
+        """分頁列出參考資料，可依標題/檔名關鍵字與摘要狀態過濾；page_size 為 None 時不分頁"""
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"不支援的排序欄位：{sort_by}")
+
+        conditions, params = [], []
+        if query:
+            # 關鍵字中的 % 與 _ 視為一般字元
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", query) + "%"
+            conditions.append("(title LIKE ? ESCAPE '\\' OR original_filename LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if summary_status:
+            conditions.append("summary_status = ?")
+            params.append(summary_status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "DESC" if descending else "ASC"
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM reference_catalog {where}", params
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM reference_catalog {where} "
+                f"ORDER BY {sort_by} {order}, folder_name {order} LIMIT ? OFFSET ?",
+                # SQLite 的 LIMIT -1 表示不限筆數
+                params + ([page_size, (page - 1) * page_size] if page_size else [-1, 0])
+            ).fetchall()
+
+        return {"total": total, "items": [dict(row) for row in rows]}
+
+    def sync(self, references_path: Path):
+        """與磁碟上的參考資料資料夾同步：補登未記錄的資料夾、移除已不存在的紀錄"""
+        on_disk = {p.name for p in references_path.iterdir() if p.is_dir()}
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT folder_name FROM reference_catalog")}
+
+        for folder_name in known - on_disk:
+            self.remove(folder_name)
+
+        for folder_name in sorted(on_disk - known):
+            folder_path = references_path / folder_name
+            pdf_path = folder_path / f"{folder_name}_original.pdf"
+            markdown_path = folder_path / f"{folder_name}_content.md"
+            summary_path = folder_path / f"{folder_name}_summary.md"
+
+            metadata = read_markdown_metadata(markdown_path)
+            sha256 = file_sha256(pdf_path) if pdf_path.exists() else None
+            self.add(
+                folder_name,
+                title=metadata.get("title", folder_name),
+                original_filename=metadata.get("original_filename", ""),
+                file_size=pdf_path.stat().st_size if pdf_path.exists() else 0,
+                sha256=sha256,
+                summary_status="completed" if summary_path.exists() else "failed",
+                created_at=datetime.fromtimestamp(folder_path.stat().st_ctime).strftime("%Y-%m-%d %H:%M:%S")
+            )
+            print(f"參考資料目錄補登：{folder_name}")
+
+
+def file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def read_markdown_metadata(markdown_path: Path) -> Dict:
+    """讀取 Markdown 檔案開頭的 metadata 區塊"""
+    metadata = {}
+    if not markdown_path.exists():
+        return metadata
+    with markdown_path.open("r", encoding="utf-8") as f:
+        head = f.read(2048)
+    for key in ("title", "original_filename"):
+        match = re.search(rf"^\s*{key}: (.*)$", head, re.MULTILINE)
+        if match:
+            metadata[key] = match.group(1).strip()
+    return metadata
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+from backend.database.file_lru import FileLRU
+
+load_dotenv()
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+AUDIO_DIR = BACKEND_DIR / "stores" / "audio"
+DEFAULT_CACHE_DIR = AUDIO_DIR / "cache"
+
+
+def normalize_text(text: str) -> str:
+    """統一 Unicode 表示法並合併空白；只差在空白的台詞會共用同一段音檔"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class SegmentCache:
+    """
+    以內容定址的語音段落快取，鍵為 (標準化文字, 語音, 語速, 音調, 輸出格式, SSML 模板版本) 的雜湊
+
+    音檔存放在 stores/audio/cache 下，可直接由 /audio 靜態路徑提供。
+    整個 stores/audio 目錄(包含完整音檔與舊的段落資料夾)超過容量上限時，依最後使用時間刪除最舊的音檔，
+    但不會刪除 pin() 標記、正在組裝中的段落。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, audio_dir=AUDIO_DIR,
+                 max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.audio_dir = Path(audio_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._store = FileLRU(self.audio_dir, "*.wav", max_bytes, recursive=True,
+                              on_remove=remove_empty_segment_dir)
+
+    @staticmethod
+    def make_key(text: str, voice_name: str, rate: float, pitch: int,
+                 output_format: str, template_version: str) -> str:
+        canonical = json.dumps(
+            [normalize_text(text), voice_name, float(rate), int(pitch), output_format, template_version],
+            ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def url_for(self, key: str) -> str:
+        """對應 /audio 靜態路徑的相對 URL"""
+        return f"/audio/{self.path_for(key).relative_to(self.audio_dir).as_posix()}"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        found = self._store.touch(path)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return path if found else None
+
+    def put(self, key: str, audio_data: bytes) -> Path:
+        path = self.path_for(key)
+        self._store.write(path, audio_data)
+        return path
+
+    def pin(self, keys: Iterable[str]):
+        """進行中的工作使用的段落不會被淘汰，直到 unpin()"""
+        self._store.pin(self.path_for(key) for key in keys)
+
+    def unpin(self, keys: Iterable[str]):
+        self._store.unpin(self.path_for(key) for key in keys)
+
+    def stats(self) -> Dict:
+        entries = list(self.cache_dir.glob("*.wav"))
+        return {
+            "entries": len(entries),
+            "size_bytes": sum(p.stat().st_size for p in entries if p.exists()),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def remove_empty_segment_dir(path: Path):
+    """刪除已清空的段落資料夾"""
+    parent = path.parent
+    if parent.parent.name == "segments" and not any(parent.iterdir()):
+        parent.rmdir()
+
+
+SEGMENT_CACHE = SegmentCache(
+    max_bytes=int(os.getenv("AUDIO_STORE_MAX_MB", "2048")) * 1024 * 1024
+)
@@ -1,10 +1,9 @@
 from langgraph.graph import StateGraph, START, END
 from typing_extensions import TypedDict
-from typing import List
+from typing import List, Optional
 
 from backend.nodes.arxiv_reading_node import arxiv_reading_node
-from backend.graphs.summarizing_graph import create_summarizing_graph
-from backend.graphs.scriptwriting_graph import create_scriptwriting_graph
+from backend.graphs.registry import get_graph
 
 class ArxivInputState(TypedDict):
     arxiv_url : str
@@ -16,6 +15,7 @@ class ArxivInputState(TypedDict):
 
 class ArxivOverallState(TypedDict):
     arxiv_url : str
+    arxiv_version : Optional[str]
     content : str
     dialogue : List[dict]
     host_name : str
@@ -25,6 +25,7 @@ class ArxivOverallState(TypedDict):
 
 
 class ArxivOutputState(TypedDict):
+    arxiv_version : Optional[str]
     dialogue : List[dict]
     host_name : str
     guest_name : str
@@ -37,8 +38,8 @@ def create_arxiv_graph():
     由 Arxiv URL 生成對話腳本
     """
     builder = StateGraph(ArxivOverallState, input=ArxivInputState, output=ArxivOutputState)
-    summarizing_graph = create_summarizing_graph()
-    scriptwriting_graph = create_scriptwriting_graph()
+    summarizing_graph = get_graph("summarizing")
+    scriptwriting_graph = get_graph("scriptwriting")
 
     # Add nodes
     builder.add_node("arxiv_reading_node", arxiv_reading_node)
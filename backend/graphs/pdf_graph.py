@@ -3,8 +3,7 @@ from typing_extensions import TypedDict
 from typing import List
 
 from backend.nodes.pdf_reading_node import pdf_reading_node
-from backend.graphs.summarizing_graph import create_summarizing_graph
-from backend.graphs.scriptwriting_graph import create_scriptwriting_graph
+from backend.graphs.registry import get_graph
 
 
 import nest_asyncio
@@ -41,8 +40,8 @@ def create_pdf_graph():
     由 PDF 路徑生成對話腳本
     """
     builder = StateGraph(PdfState, input=PdfInputState, output=PdfOutputState)
-    summarizing_graph = create_summarizing_graph()
-    scriptwriting_graph = create_scriptwriting_graph()
+    summarizing_graph = get_graph("summarizing")
+    scriptwriting_graph = get_graph("scriptwriting")
 
     # Add nodes
     builder.add_node("pdf_reading_node", pdf_reading_node)
@@ -2,8 +2,7 @@ from langgraph.graph import StateGraph
 from langgraph.constants import START, END
 
 from backend.states import PromptState, PromptInputState, PromptOutputState
-from backend.graphs.research_graph import create_research_graph
-from backend.graphs.scriptwriting_graph import create_scriptwriting_graph
+from backend.graphs.registry import get_graph
 
 def topic_to_instruction(state):
     return {"instruction": state["topic"]}
@@ -13,8 +12,8 @@ def report_reading_node(state):
 
 
 def create_prompt_graph():
-    research_graph = create_research_graph()
-    scriptwriting_graph = create_scriptwriting_graph()
+    research_graph = get_graph("research")
+    scriptwriting_graph = get_graph("scriptwriting")
 
     builder = StateGraph(PromptState, input=PromptInputState, output=PromptOutputState)
     builder.add_node("research_graph", research_graph)
@@ -0,0 +1,46 @@
+import importlib
+import threading
+import time
+from typing import Dict
+
+
+# 圖名稱 → (模組, 建構函式)，模組在第一次需要時才匯入
+GRAPH_BUILDERS = {
+    "summarizing": ("backend.graphs.summarizing_graph", "create_summarizing_graph"),
+    "scriptwriting": ("backend.graphs.scriptwriting_graph", "create_scriptwriting_graph"),
+    "interview": ("backend.graphs.interview_graph", "create_interview_graph"),
+    "research": ("backend.graphs.research_graph", "create_research_graph"),
+    "pdf": ("backend.graphs.pdf_graph", "create_pdf_graph"),
+    "arxiv": ("backend.graphs.arxiv_graph", "create_arxiv_graph"),
+    "prompt": ("backend.graphs.prompt_graph", "create_prompt_graph"),
+}
+
+_graphs: Dict[str, object] = {}
+# 可重入鎖：編譯外層圖時會在同一執行緒內再取得子圖
+_lock = threading.RLock()
+
+
+def get_graph(name: str):
+    """取得編譯好的圖，每個圖在行程中只編譯一次，子圖由所有外層圖共用"""
+    graph = _graphs.get(name)
+    if graph is not None:
+        return graph
+
+    with _lock:
+        if name not in _graphs:
+            if name not in GRAPH_BUILDERS:
+                raise KeyError(f"未知的圖：{name}")
+            module_name, builder_name = GRAPH_BUILDERS[name]
+            builder = getattr(importlib.import_module(module_name), builder_name)
+            _graphs[name] = builder()
+        return _graphs[name]
+
+
+def compile_all() -> Dict[str, float]:
+    """編譯所有圖，回傳每個圖的編譯耗時(秒)"""
+    timings = {}
+    for name in GRAPH_BUILDERS:
+        start = time.perf_counter()
+        get_graph(name)
+        timings[name] = time.perf_counter() - start
+    return timings
@@ -4,20 +4,21 @@ from langchain_core.messages import HumanMessage
 from langgraph.constants import Send
 
 from backend.states import ResearchGraphState
-from backend.graphs.interview_graph import create_interview_graph
 from backend.nodes.interview_nodes import create_analysts_node
 from backend.nodes.write_nodes import write_report_node, write_introduction_node, write_conclusion_node, finalize_report_node
+from backend.graphs.registry import get_graph
 
 
 def initiate_all_interviews(state: ResearchGraphState):
     """ This is the "map" step where we run each interview sub-graph using Send API """    
     topic = state["topic"]
     return [Send("conduct_interview", {"analyst": analyst,
-                                       "messages": [HumanMessage(content=f"So you said you were writing an article on {topic}?")]}) for analyst in state["analysts"]]
+                                       "messages": [HumanMessage(content=f"So you said you were writing an article on {topic}?")],
+                                       "reference_folders": state.get("reference_folders")}) for analyst in state["analysts"]]
 
 
 def create_research_graph():
-    interview_graph = create_interview_graph()
+    interview_graph = get_graph("interview")
 
     builder = StateGraph(ResearchGraphState)
     builder.add_node("create_analysts", create_analysts_node)
@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class JobQueueFullError(Exception):
+    """工作佇列已滿，暫時無法接受新的工作"""
+
+
+class Job:
+    """單一背景工作，記錄狀態、進度事件與結果"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress: List[str] = []
+        self.result: Any = None
+        self.error: Optional[str] = None
+        # 失敗時的例外，供 API 依例外類型決定回應狀態碼
+        self.exception: Optional[Exception] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+        self._waiters: List[tuple] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": list(self.progress),
+            "error": self.error,
+            "error_type": type(self.exception).__name__ if self.exception else None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+    def report(self, step: str, **data):
+        """回報工作進度(通常是剛完成的節點名稱)"""
+        with self._lock:
+            self.progress.append(step)
+        self._publish({"type": "progress", "step": step, **data})
+
+    def emit(self, event_type: str, data: Dict):
+        """送出節點自訂的中間結果(例如腳本大綱、逐段對話)"""
+        self._publish({"type": event_type, **data})
+
+    def _publish(self, event: Dict, **updates):
+        # 狀態更新與事件寫入必須在同一個鎖內完成，訂閱者才不會漏掉最後一個事件
+        with self._lock:
+            for key, value in updates.items():
+                setattr(self, key, value)
+            self.events.append({"job_id": self.id, **event})
+            waiters = list(self._waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+
+    async def stream_events(self):
+        """依序產生此工作的所有事件，直到工作結束"""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._lock:
+            self._waiters.append(waiter)
+        try:
+            index = 0
+            while True:
+                waiter[1].clear()
+                with self._lock:
+                    pending = self.events[index:]
+                    finished = self.done
+                index += len(pending)
+                for event in pending:
+                    yield event
+                if finished and not pending:
+                    return
+                if not pending:
+                    await waiter[1].wait()
+        finally:
+            with self._lock:
+                self._waiters.remove(waiter)
+
+    async def wait(self) -> "Job":
+        """等待工作結束"""
+        async for _ in self.stream_events():
+            pass
+        return self
+
+
+class JobManager:
+    """以固定大小的執行緒池執行長時間工作，並限制排隊中的工作數量"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8,
+                 keep_finished: int = 200, result_ttl: float = 3600):
+        """
+        Args:
+            max_workers: 同時執行的工作數量
+            max_pending: 最多可排隊等待的工作數量，超過即拒絕新工作
+            keep_finished: 最多保留多少筆已完成的工作供查詢
+            result_ttl: 已完成工作保留的秒數
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[Job], Any]) -> Job:
+        """提交工作，fn 會在工作執行緒中以 fn(job) 呼叫，其回傳值即為工作結果"""
+        with self._lock:
+            self._prune()
+            if self._active >= self.max_workers + self.max_pending:
+                raise JobQueueFullError(
+                    f"目前有 {self._active} 個工作執行或排隊中，請稍後再試"
+                )
+            self._active += 1
+            job = Job(kind)
+            self._jobs[job.id] = job
+
+        job._publish({"type": "queued", "kind": kind})
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def complete(self, kind: str, result: Any, **data) -> Job:
+        """登錄一個已有結果的工作(例如快取命中)，不佔用工作池"""
+        with self._lock:
+            self._prune()
+            job = Job(kind)
+            self._jobs[job.id] = job
+
+        now = time.time()
+        job._publish({"type": "complete", "result": result, **data},
+                     status="succeeded", result=result, started_at=now, finished_at=now)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": running,
+                "queued": self._active - running,
+            }
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]):
+        job._publish({"type": "started"}, status="running", started_at=time.time())
+        try:
+            result = fn(job)
+        except Exception as e:
+            print(f"工作 {job.id} ({job.kind}) 失敗：{str(e)}")
+            job._publish({"type": "error", "message": str(e)},
+                         status="failed", error=str(e), exception=e, finished_at=time.time())
+        else:
+            job._publish({"type": "complete", "result": result},
+                         status="succeeded", result=result, finished_at=time.time())
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _prune(self):
+        """移除過期或超出保留數量的已完成工作(呼叫者需持有鎖)"""
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.done),
+            key=lambda job: job.finished_at,
+        )
+        overflow = len(finished) - self.keep_finished
+        for i, job in enumerate(finished):
+            if i < overflow or now - job.finished_at > self.result_ttl:
+                del self._jobs[job.id]
+
+
+class JobEventHandler(BaseCallbackHandler):
+    """將節點以 dispatch_custom_event 送出的事件轉送為工作事件"""
+
+    def __init__(self, job: Job):
+        self.job = job
+
+    def on_custom_event(self, name: str, data: Any, **kwargs):
+        self.job.emit(name, data if isinstance(data, dict) else {"data": data})
+
+
+def run_graph(graph, inputs: Dict, job: Job) -> Dict:
+    """串流執行 LangGraph 圖，每完成一個節點就回報進度，並回傳最終輸出"""
+    output = None
+    config = {"callbacks": [JobEventHandler(job)]}
+    for mode, chunk in graph.stream(inputs, config, stream_mode=["updates", "values"]):
+        if mode == "updates":
+            for node in chunk:
+                job.report(node)
+        else:
+            output = chunk
+    return output
@@ -1,43 +1,60 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 import json
 import os
-import pdfplumber
 import io
 import shutil
+import hashlib
+import tempfile
 import unicodedata
 import re
+import time
 from pathlib import Path
 from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse
 from dotenv import load_dotenv
 from datetime import datetime
 import azure.cognitiveservices.speech as speechsdk
 
-from backend.graphs.pdf_graph import create_pdf_graph
-from backend.graphs.arxiv_graph import create_arxiv_graph
-from backend.graphs.research_graph import create_research_graph
-from backend.graphs.scriptwriting_graph import create_scriptwriting_graph
-from backend.graphs.summarizing_graph import create_summarizing_graph
-from backend.graphs.prompt_graph import create_prompt_graph
+from backend.graphs.registry import get_graph
 from backend.schema import *
 from backend.speech_synthesis import synthesize_podcast, PodcastSynthesizer
-from backend.database.qdrant_manager import QdrantManager
-from backend.models.embedding import EMBEDDING_MODEL
+from backend.speech_pool import SYNTHESIZER_POOL
+from backend.database.qdrant_manager import get_qdrant_manager
+from backend.pdf_extraction import PdfExtraction
+from backend.database.extraction_cache import EXTRACTION_CACHE
+from backend.database.embedding_cache import EMBEDDING_CACHE
+from backend.database.query_cache import QUERY_CACHE
+from backend.database.segment_cache import SEGMENT_CACHE
+from backend.database.reference_catalog import ReferenceCatalog, SORTABLE_COLUMNS, SUMMARY_STATUSES
+from backend.database.result_cache import ResultCache
+from backend.nodes.arxiv_reading_node import get_arxiv_id, get_latest_version
+from backend.models.llm import LLM
+from backend.jobs import Job, JobManager, JobQueueFullError, run_graph
+from backend.warmup import WARMUP_STATE, warm_up_in_background
 
 load_dotenv()
 
-writing_graph = create_scriptwriting_graph()
-summarizing_graph = create_summarizing_graph()
-pdf_graph = create_pdf_graph()
-arxiv_graph = create_arxiv_graph()
-research_graph = create_research_graph()
-prompt_graph = create_prompt_graph()
+# 腳本生成工作池：限制同時執行與排隊的工作數量
+job_manager = JobManager(
+    max_workers=int(os.getenv("JOB_MAX_WORKERS", "2")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "8"))
+)
 
 app = FastAPI()
 
+# 圖在第一次使用時才編譯、模型在第一次使用時才載入；
+# 啟動後於背景暖機，完成前 /api/health/ready 回傳 503
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+@app.on_event("startup")
+async def start_warmup():
+    if WARMUP_ON_STARTUP:
+        warm_up_in_background()
+
 # 修改 CORS 設定
 app.add_middleware(
     CORSMiddleware,
@@ -53,12 +70,50 @@ BASE_DIR = Path(__file__).resolve().parent
 REFERENCES_PATH = BASE_DIR / "stores" / "references"
 TEMP_PATH = BASE_DIR / "stores" / "temp"
 AUDIO_DIR = BASE_DIR / "stores" / "audio"
+CATALOG_PATH = BASE_DIR / "stores" / "references.db"
+
+# 上傳設定：內容以固定大小的區塊直接寫入磁碟，上限可依需求調整
+MAX_UPLOAD_SIZE = int(os.getenv("PDF_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SCRIPT_CACHE_PATH = BASE_DIR / "stores" / "script_cache.db"
 
 # 確保目錄存在
 TEMP_PATH.mkdir(parents=True, exist_ok=True)
 REFERENCES_PATH.mkdir(parents=True, exist_ok=True)
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
+# 超過此秒數未再寫入的 .part 暫存檔視為中斷後遺留；
+# 多個 worker 共用同一個目錄，較新的檔案可能是其他 worker 正在寫入的上傳
+STALE_PART_FILE_AGE = 3600
+
+
+def remove_stale_part_files(directory: Path, pattern: str = "*.part", max_age: float = STALE_PART_FILE_AGE):
+    """刪除 directory 中修改時間早於 max_age 秒前的暫存檔"""
+    cutoff = time.time() - max_age
+    for part_file in directory.glob(pattern):
+        try:
+            if part_file.stat().st_mtime < cutoff:
+                part_file.unlink(missing_ok=True)
+        except FileNotFoundError:
+            continue
+
+
+# 清除上次中斷的上傳與未組裝完成的整集音檔所留下的暫存檔
+remove_stale_part_files(TEMP_PATH)
+remove_stale_part_files(AUDIO_DIR, "*.wav.part")
+
+# 參考資料目錄，啟動時補登既有資料夾，之後由上傳與刪除端點維護
+reference_catalog = ReferenceCatalog(CATALOG_PATH)
+reference_catalog.sync(REFERENCES_PATH)
+
+# 腳本生成結果快取，版本標籤包含提示詞版本與模型名稱，任一變更即不再命中舊結果
+script_cache = ResultCache(
+    SCRIPT_CACHE_PATH,
+    version=f"{os.getenv('SCRIPT_PROMPT_VERSION', 'v1')}:{LLM.model_name}",
+    ttl=float(os.getenv("SCRIPT_CACHE_TTL", str(7 * 24 * 3600))),
+    max_bytes=int(os.getenv("SCRIPT_CACHE_MAX_MB", "256")) * 1024 * 1024
+)
+
 # 掛載靜態檔案服務
 app.mount("/audio", StaticFiles(directory=str(AUDIO_DIR)), name="audio")
 
@@ -70,6 +125,8 @@ class PromptInput(BaseModel):
     host_background: str = Field(examples = ["主持人是一位資深記者，擁有豐富的新聞採訪經驗，擅長以輕鬆有趣的方式採訪嘉賓，並將複雜的議題轉化為聽眾容易理解的內容。"], description="主持人背景")
     guest_name: str = Field(examples = ["來賓"], description="來賓名字")
     guest_background: str = Field(examples = ["來賓是一位資深的領域專家，擁有豐富的研究經驗，擅長以輕鬆有趣的方式解釋複雜的議題，並將其轉化為聽眾容易理解的內容。"], description="來賓背景")
+    reference_folders: Optional[List[str]] = Field(None, description="只在這些參考資料資料夾中檢索，未指定則搜尋全部參考資料")
+    force_refresh: bool = Field(False, description="忽略快取，重新生成腳本")
 
 class PdfInput(BaseModel):
     pdf_file: UploadFile = File(...)
@@ -127,11 +184,65 @@ class RequestData(BaseModel):
 # 確保參考資料目錄存在
 REFERENCES_PATH.mkdir(parents=True, exist_ok=True)
 
-def create_reference_folder(folder_name: str) -> Path:
-    """建立參考資料資料夾"""
+def allocate_folder(base_path: Path, timestamp: str) -> str:
+    """以時間戳建立新資料夾，同一秒內有多個上傳時加上序號避免互相覆蓋"""
+    folder_name, n = timestamp, 1
+    while True:
+        try:
+            (base_path / folder_name).mkdir(parents=True)
+            return folder_name
+        except FileExistsError:
+            n += 1
+            folder_name = f"{timestamp}_{n}"
+
+async def receive_upload(upload_file: UploadFile) -> tuple:
+    """將上傳內容分塊寫入暫存檔，同時計算雜湊與檢查大小，記憶體用量與檔案大小無關
+
+    Returns:
+        (暫存檔路徑, 檔案大小, SHA-256)
+    """
+    file_size = 0
+    sha256 = hashlib.sha256()
+    fd, part_path = tempfile.mkstemp(dir=TEMP_PATH, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"檔案大小超過限制（最大 {MAX_UPLOAD_SIZE // 1024 // 1024}MB）"
+                    )
+                sha256.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(part_path)
+        raise
+    return Path(part_path), file_size, sha256.hexdigest()
+
+def find_duplicate_reference(sha256: str) -> Optional[Dict]:
+    """查詢內容相同且已完成摘要的參考資料，資料夾已不存在時移除其紀錄"""
+    entry = reference_catalog.find_by_hash(sha256)
+    if not entry:
+        return None
+
+    folder_name = entry["folder_name"]
     folder_path = REFERENCES_PATH / folder_name
-    folder_path.mkdir(parents=True, exist_ok=True)
-    return folder_path
+    summary_path = folder_path / f"{folder_name}_summary.md"
+    if not folder_path.exists():
+        reference_catalog.remove(folder_name)
+        return None
+    if not summary_path.exists():
+        reference_catalog.set_summary_status(folder_name, "failed")
+        return None
+
+    return {
+        "folder_name": folder_name,
+        "folder_path": str(folder_path),
+        "pdf_path": str(folder_path / f"{folder_name}_original.pdf"),
+        "markdown_path": str(folder_path / f"{folder_name}_content.md"),
+        "summary_path": str(summary_path),
+    }
 
 def sanitize_filename(filename):
     """清理檔案名稱，移除特殊字元並轉換空格"""
@@ -147,32 +258,13 @@ def sanitize_filename(filename):
     
     return name  # 返回不帶副檔名的檔案名稱
 
-def pdf_to_markdown(pdf_content):
-    """將 PDF 內容轉換為 Markdown 格式"""
+def extract_pdf_or_400(pdf_path: Path, sha256: str) -> PdfExtraction:
+    """單次解析 PDF(優先使用解析快取)取得 Markdown 與純文字，失敗時轉為 HTTP 400"""
     try:
-        markdown_content = []
-        with pdfplumber.open(pdf_content) as pdf:
-            # 處理每一頁
-            for i, page in enumerate(pdf.pages, 1):
-                text = page.extract_text() or ""
-                if text.strip():  # 如果頁面有內容
-                    # 添加頁碼標題
-                    markdown_content.append(f"\n## Page {i}\n")
-                    # 處理段落
-                    paragraphs = text.split('\n\n')
-                    for para in paragraphs:
-                        if para.strip():
-                            markdown_content.append(para.strip() + "\n\n")
-                            
-        return "".join(markdown_content)
+        return EXTRACTION_CACHE.get_or_extract(pdf_path, sha256)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"PDF 轉換失敗：{str(e)}")
 
-def pdf_to_text(pdf_content):
-    """將 PDF 內容轉換為純文字"""
-    with pdfplumber.open(pdf_content) as pdf:
-        return "\n".join(page.extract_text() for page in pdf.pages)
-
 
 
 @app.post("/api/upload/pdf")
@@ -182,57 +274,65 @@ async def upload_pdf(
 ):
     """上傳 PDF 並生成摘要，可選擇是否為臨時檔案(若為臨時檔案則不作摘要僅暫存)"""
 
-    MAX_FILE_SIZE = 10 * 1024 * 1024 # 10MB in bytes
-    
+    part_path = None
     try:
-        # 檢查檔案大小
-        file_size = 0
-        content = bytearray()
-        
-        while chunk := await pdf_file.read(8192):
-            file_size += len(chunk)
-            if file_size > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=413,
-                    detail="檔案大小超過限制（最大 10MB）"
-                )
-            content.extend(chunk)
-        
-        # 重置檔案指針
-        await pdf_file.seek(0)
+        # 串流寫入暫存檔並檢查檔案大小
+        part_path, file_size, content_hash = await receive_upload(pdf_file)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         if is_temporary:
             # 臨時儲存
-            temp_path = TEMP_PATH / timestamp
-            temp_path.mkdir(parents=True, exist_ok=True)
-            file_path = temp_path / f"{timestamp}_original.pdf"
-            
-            with file_path.open("wb") as f:
-                f.write(content)
+            temp_folder = allocate_folder(TEMP_PATH, timestamp)
+            file_path = TEMP_PATH / temp_folder / f"{temp_folder}_original.pdf"
+            os.replace(part_path, file_path)
             
             return {
                 "status": "success",
                 "message": "臨時 PDF 檔案已上傳",
-                "temp_folder": timestamp,
-                "file_path": str(file_path)
+                "temp_folder": temp_folder,
+                "file_path": str(file_path),
+                "sha256": content_hash
             }
         else:
+            # 相同內容已上傳過，直接回傳既有的資料夾、Markdown 與摘要(向量也已存在)
+            duplicate = find_duplicate_reference(content_hash)
+            if duplicate:
+                print(f"重複上傳，使用既有參考資料：{duplicate['folder_name']}")
+                return {
+                    "status": "success",
+                    "message": "相同的 PDF 已存在，直接使用既有的參考資料",
+                    "duplicate": True,
+                    "sha256": content_hash,
+                    **duplicate,
+                    "file_size_mb": f"{file_size / 1024 / 1024:.2f}MB"
+                }
+
             # 長期儲存
             clean_filename = sanitize_filename(pdf_file.filename)
-            folder_path = create_reference_folder(timestamp)
-            
-            # 儲存 PDF 檔案 - 使用{時間}_original格式
-            pdf_path = folder_path / f"{timestamp}_original.pdf"
-            with pdf_path.open("wb") as f:
-                f.write(content)
-            
-            # 將 PDF 轉換為 Markdown
-            markdown_content = pdf_to_markdown(io.BytesIO(content))
+            folder_name = allocate_folder(REFERENCES_PATH, timestamp)
+            folder_path = REFERENCES_PATH / folder_name
             
-            # 在 Markdown 檔案開頭添加 metadata
-            metadata = f"""---
+            # 儲存 PDF 檔案 - 使用{時間}_original格式，暫存檔直接搬移不再複製
+            pdf_path = folder_path / f"{folder_name}_original.pdf"
+            os.replace(part_path, pdf_path)
+
+            # 資料夾建立後立即登錄(摘要狀態為 pending)，解析失敗時標記為 failed，列表中不會漏掉
+            reference_catalog.add(
+                folder_name,
+                title=clean_filename,
+                original_filename=pdf_file.filename,
+                file_size=file_size,
+                sha256=content_hash
+            )
+
+            try:
+                # 單次解析 PDF，同時取得 Markdown 與純文字(直接由檔案路徑解析)
+                extraction = await run_in_threadpool(extract_pdf_or_400, pdf_path, content_hash)
+                markdown_content = extraction.markdown
+
+                # 在 Markdown 檔案開頭添加 metadata
+                metadata = f"""---
             title: {clean_filename}
             original_filename: {pdf_file.filename}
             date_converted: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
@@ -240,19 +340,20 @@ async def upload_pdf(
             ---
 
             """
-            # 儲存 Markdown 檔案 - 使用時間_markdown格式
-            markdown_path = folder_path / f"{timestamp}_content.md"
-            with markdown_path.open("w", encoding="utf-8") as f:
-                f.write(metadata + markdown_content)
+                # 儲存 Markdown 檔案 - 使用時間_markdown格式
+                markdown_path = folder_path / f"{folder_name}_content.md"
+                with markdown_path.open("w", encoding="utf-8") as f:
+                    f.write(metadata + markdown_content)
+            except BaseException:
+                reference_catalog.set_summary_status(folder_name, "failed")
+                raise
             
             # 生成論文摘要
+            summary_path = folder_path / f"{folder_name}_summary.md"
             try:
-                # 將 PDF 轉換為純文本以利於用於摘要處理
-                text_content = pdf_to_text(io.BytesIO(content))
-                
-                # 使��� summarizing_workflow 生成總結
-                summary_input = {"content": text_content}
-                summary_output = summarizing_graph.invoke(summary_input)
+                # 使用 summarizing_workflow 以純文字生成總結
+                summary_input = {"content": extraction.text}
+                summary_output = await run_in_threadpool(lambda: get_graph("summarizing").invoke(summary_input))
                 
                 # 解析 JSON 格式的總結內容
                 summary_dict = summary_output if isinstance(summary_output, dict) else json.loads(summary_output)
@@ -261,15 +362,23 @@ async def upload_pdf(
                 summary_md = summary_dict.get('content', '無內容')
                 
                 # 儲存摘要到 summary.md - 使用{時間}_summary格式
-                summary_path = folder_path / f"{timestamp}_summary.md"
                 with summary_path.open("w", encoding="utf-8") as f:
                     f.write(summary_md)
                 
                 # 將摘要存入向量資料庫
-                qdrant_manager = QdrantManager(EMBEDDING_MODEL)
-                qdrant_manager.split_and_add_summary(summary_md, folder_name=timestamp)
+                qdrant_manager = get_qdrant_manager()
+                await run_in_threadpool(
+                    qdrant_manager.split_and_add_summary,
+                    summary_md,
+                    folder_name=folder_name,
+                    upload_date=datetime.now().strftime("%Y-%m-%d")
+                )
+
+                # 摘要與向量都完成後才標記完成，之後的重複上傳才能直接沿用
+                reference_catalog.set_summary_status(folder_name, "completed")
 
             except Exception as e:
+                reference_catalog.set_summary_status(folder_name, "failed")
                 print(f"生成摘要時發生錯誤：{str(e)}")
                 # 繼續執行，不中斷上傳流程
             
@@ -278,11 +387,13 @@ async def upload_pdf(
             return {
                 "status": "success",
                 "message": "PDF 和 Markdown 檔案已成功儲存",
-                "folder_name": timestamp,
+                "folder_name": folder_name,
                 "folder_path": str(folder_path),
                 "pdf_path": str(pdf_path),
                 "markdown_path": str(markdown_path),
                 "summary_path": str(summary_path),
+                "duplicate": False,
+                "sha256": content_hash,
                 "file_size_mb": f"{file_size / 1024 / 1024:.2f}MB"
             }
         
@@ -293,6 +404,10 @@ async def upload_pdf(
             status_code=500,
             detail=f"處理失敗：{str(e)}"
         )
+    finally:
+        # 重複上傳或處理失敗時，清除尚未搬移的暫存檔
+        if part_path and part_path.exists():
+            part_path.unlink()
 
 
 
@@ -311,9 +426,10 @@ async def delete_reference(folder_name: str):
         
         # 刪除資料夾及其內容
         shutil.rmtree(folder_path)
+        reference_catalog.remove(folder_name)
         
         # 刪除向量資料庫中的摘要
-        qdrant_manager = QdrantManager(EMBEDDING_MODEL)
+        qdrant_manager = get_qdrant_manager()
         qdrant_manager.delete_summary(folder_name)
         
         return {
@@ -333,24 +449,56 @@ async def delete_reference(folder_name: str):
 
 
 @app.get("/api/references")
-async def list_references():
-    """列出所有參考資料(包含所有原始上傳的PDF檔案、Markdown、摘要)"""
+async def list_references(
+    page: int = 1,
+    page_size: Optional[int] = None,
+    sort_by: str = "created_at",
+    order: str = "desc",
+    q: Optional[str] = None,
+    summary_status: Optional[str] = None
+):
+    """列出參考資料(由參考資料目錄提供，支援分頁、排序與依標題/檔名、摘要狀態過濾)"""
+    # 未指定 page_size 時回傳全部(相容未分頁的既有呼叫端)
+    if page < 1 or (page_size is not None and not 1 <= page_size <= 1000):
+        raise HTTPException(status_code=400, detail="page 需大於 0，page_size 需介於 1 到 1000")
+    if sort_by not in SORTABLE_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort_by 需為 {', '.join(SORTABLE_COLUMNS)} 其中之一")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order 需為 asc 或 desc")
+    if summary_status and summary_status not in SUMMARY_STATUSES:
+        raise HTTPException(status_code=400, detail=f"summary_status 需為 {', '.join(SUMMARY_STATUSES)} 其中之一")
+
     try:
+        result = reference_catalog.list(
+            page=page,
+            page_size=page_size,
+            sort_by=sort_by,
+            descending=order == "desc",
+            query=q,
+            summary_status=summary_status
+        )
+
         references = []
-        for folder_path in REFERENCES_PATH.iterdir():
-            if folder_path.is_dir():
-                # 取得資料夾內的檔案
-                files = list(folder_path.glob("*"))
-                references.append({
-                    "folder_name": folder_path.name,
-                    "folder_path": str(folder_path),
-                    "files": [str(f) for f in files],
-                    "created_time": datetime.fromtimestamp(folder_path.stat().st_ctime).strftime("%Y-%m-%d %H:%M:%S")
-                })
+        for entry in result["items"]:
+            folder_name = entry["folder_name"]
+            folder_path = REFERENCES_PATH / folder_name
+            # 檔案路徑依命名規則組成，不需逐一掃描資料夾
+            files = [folder_path / f"{folder_name}_original.pdf", folder_path / f"{folder_name}_content.md"]
+            if entry["summary_status"] == "completed":
+                files.append(folder_path / f"{folder_name}_summary.md")
+            references.append({
+                **entry,
+                "folder_path": str(folder_path),
+                "files": [str(f) for f in files],
+                "created_time": entry["created_at"]
+            })
         
         return {
             "status": "success",
-            "references": sorted(references, key=lambda x: x["created_time"], reverse=True)
+            "total": result["total"],
+            "page": page,
+            "page_size": page_size,
+            "references": references
         }
         
     except Exception as e:
@@ -361,20 +509,168 @@ async def list_references():
 
 
 
-@app.post("/api/generate/script/prompt")
-async def generate_from_prompt(inputs: PromptInput) -> PodcastScript:
-    """從 Prompt 生成 Podcast 對話腳本"""
+def submit_job(kind: str, fn) -> Job:
+    """提交背景工作，佇列已滿時回傳 503"""
+    try:
+        return job_manager.submit(kind, fn)
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
 
-    output = prompt_graph.invoke({
+def job_output(job: Job, client_errors: tuple = ()):
+    """取得已結束工作的結果，失敗時轉為 HTTPException；client_errors 中的例外類型回傳 400"""
+    if job.status != "succeeded":
+        if isinstance(job.exception, client_errors):
+            raise HTTPException(status_code=400, detail=job.error)
+        raise HTTPException(
+            status_code=500,
+            detail=f"生成腳本時發生錯誤: {job.error}"
+        )
+    return job.result
+
+def submit_script_job(kind: str, cache_inputs: Optional[Dict], fn,
+                      force_refresh: bool = False, on_cache_hit=None) -> Job:
+    """提交腳本生成工作；相同輸入已有快取結果時直接回傳已完成的工作"""
+    key = script_cache.make_key(kind, cache_inputs) if cache_inputs else None
+    if key and not force_refresh:
+        cached = script_cache.get(key)
+        if cached is not None:
+            print(f"腳本快取命中：{kind} {key[:12]}")
+            if on_cache_hit:
+                on_cache_hit()
+            return job_manager.complete(kind, cached, cached=True)
+
+    def run(job: Job):
+        output = fn(job)
+        if key:
+            script_cache.set(key, output)
+        return output
+
+    return submit_job(kind, run)
+
+def arxiv_cache_identity(arxiv_url: str) -> Optional[Dict]:
+    """取得 arXiv 論文 ID 與最新版本號，作為快取鍵的一部分；查不到版本時不使用快取"""
+    arxiv_id = get_arxiv_id(arxiv_url)
+    if not arxiv_id:
+        return None
+    arxiv_id = re.sub(r'v\d+$', '', arxiv_id)
+    try:
+        version = get_latest_version(arxiv_id)
+    except Exception as e:
+        print(f"查詢 arXiv 版本失敗：{str(e)}")
+        return None
+    if not version:
+        return None
+    return {"arxiv_id": arxiv_id, "version": version}
+
+def submit_prompt_job(inputs: PromptInput) -> Job:
+    graph_inputs = {
         "topic": inputs.topic,  
         "max_analysts": inputs.max_analysts,
         "host_name": inputs.host_name,
         "host_background": inputs.host_background,
         "guest_name": inputs.guest_name,
-        "guest_background": inputs.guest_background
-    })
+        "guest_background": inputs.guest_background,
+        "reference_folders": sorted(inputs.reference_folders or [])
+    }
+    return submit_script_job(
+        "prompt",
+        graph_inputs,
+        lambda job: run_graph(get_graph("prompt"), graph_inputs, job),
+        force_refresh=inputs.force_refresh
+    )
+
+async def submit_pdf_job(
+    pdf_file: UploadFile,
+    host_name: str,
+    host_background: str,
+    guest_name: str,
+    guest_background: str,
+    force_refresh: bool = False
+) -> Job:
+    # 先上傳為臨時檔案，上傳內容必須在請求結束前讀取完畢
+    upload_response = await upload_pdf(pdf_file, is_temporary=True)
+    
+    if upload_response["status"] != "success":
+        raise HTTPException(status_code=500, detail="PDF 上傳失敗")
+        
+    temp_folder = upload_response["temp_folder"]
+    personas = {
+        "host_name": host_name,
+        "host_background": host_background,
+        "guest_name": guest_name,
+        "guest_background": guest_background
+    }
+    graph_inputs = {"pdf_path": upload_response["file_path"], **personas}
+    cache_inputs = {"sha256": upload_response["sha256"], **personas}
+
+    def remove_temp():
+        shutil.rmtree(TEMP_PATH / temp_folder, ignore_errors=True)
+
+    def run(job: Job):
+        try:
+            return run_graph(get_graph("pdf"), graph_inputs, job)
+        finally:
+            # 處理完成後刪除臨時檔案
+            remove_temp()
 
-    return output
+    try:
+        return submit_script_job("pdf", cache_inputs, run,
+                                 force_refresh=force_refresh, on_cache_hit=remove_temp)
+    except HTTPException:
+        await delete_temp(temp_folder)
+        raise
+
+async def submit_arxiv_job(request: ArxivScriptRequest) -> Job:
+    # 驗證 URL 格式
+    if not request.arxiv_url.startswith('https://arxiv.org/abs/'):
+        raise HTTPException(
+            status_code=400,
+            detail="無效的 arXiv URL 格式"
+        )
+
+    personas = {
+        "host_name": request.host_name,
+        "host_background": request.host_background,
+        "guest_name": request.guest_name,
+        "guest_background": request.guest_background
+    }
+    graph_inputs = {"arxiv_url": request.arxiv_url, **personas}
+
+    # 以論文 ID 與版本(而非 URL 字串)作為快取鍵；force_refresh 不需查詢快取，
+    # 略過額外的 arXiv API 呼叫，改用工作執行時讀取論文所得到的版本寫入快取
+    if request.force_refresh:
+        cache_inputs = None
+    else:
+        identity = await run_in_threadpool(arxiv_cache_identity, request.arxiv_url)
+        cache_inputs = {**identity, **personas} if identity else None
+
+    def run(job: Job):
+        output = run_graph(get_graph("arxiv"), graph_inputs, job)
+        # 驗證輸出格式
+        if not isinstance(output, dict) or 'dialogue' not in output:
+            print(f"非預期的輸出格式: {output}")
+            raise ValueError("生成的腳本格式不正確")
+        version = output.pop("arxiv_version", None)
+        arxiv_id = get_arxiv_id(request.arxiv_url)
+        if request.force_refresh and arxiv_id and version:
+            identity = {"arxiv_id": re.sub(r'v\d+$', '', arxiv_id), "version": version}
+            script_cache.set(script_cache.make_key("arxiv", {**identity, **personas}), output)
+        return output
+
+    return submit_script_job("arxiv", cache_inputs, run, force_refresh=request.force_refresh)
+
+
+
+@app.post("/api/generate/script/prompt")
+async def generate_from_prompt(inputs: PromptInput) -> PodcastScript:
+    """從 Prompt 生成 Podcast 對話腳本"""
+
+    job = await submit_prompt_job(inputs).wait()
+    return job_output(job)
 
 
 @app.post("/api/generate/script/pdf")
@@ -383,35 +679,17 @@ async def generate_from_pdf(
     host_name: str = Form(...),
     host_background: str = Form(...),
     guest_name: str = Form(...),
-    guest_background: str = Form(...)
+    guest_background: str = Form(...),
+    force_refresh: bool = Form(False)
 ) -> PodcastScript:
     """從 PDF 生成 Podcast"""
     try:
-        # 先上傳為臨時檔案
-        upload_response = await upload_pdf(pdf_file, is_temporary=True)
-        
-        if upload_response["status"] != "success":
-            raise HTTPException(status_code=500, detail="PDF 上傳失敗")
-            
-        temp_file_path = upload_response["file_path"]
-        temp_folder = upload_response["temp_folder"]
-        
-        try:
-            # 使用臨時檔案路徑呼叫 pdf_graph
-            output = pdf_graph.invoke({
-                "pdf_path": temp_file_path,
-                "host_name": host_name,
-                "host_background": host_background,
-                "guest_name": guest_name,
-                "guest_background": guest_background
-            })
-            
-            return output
-            
-        finally:
-            # 處理完成後刪除臨時檔案
-            await delete_temp(temp_folder)
+        job = await submit_pdf_job(pdf_file, host_name, host_background, guest_name, guest_background, force_refresh)
+        await job.wait()
+        return job_output(job)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -420,55 +698,150 @@ async def generate_from_pdf(
 @app.post("/api/generate/script/arxiv")
 async def generate_script_from_arxiv(request: ArxivScriptRequest):
     """從 arXiv 論文生成 Podcast 腳本"""
-    try:
-        print(f"收到 arXiv 請求: {request}")
-        
-        # 驗證 URL 格式
-        if not request.arxiv_url.startswith('https://arxiv.org/abs/'):
-            raise HTTPException(
-                status_code=400,
-                detail="無效的 arXiv URL 格式"
-            )
-        
-        try:
-            # 使用 arxiv_graph 生成腳本
-            output = arxiv_graph.invoke({
-                "arxiv_url": request.arxiv_url,
-                "host_name": request.host_name,
-                "host_background": request.host_background,
-                "guest_name": request.guest_name,
-                "guest_background": request.guest_background
-            })
-            
-            # 驗證輸出格式
-            if not isinstance(output, dict) or 'dialogue' not in output:
-                print(f"非預期的輸出格式: {output}")
-                raise ValueError("生成的腳本格式不正確")
-                
-            print(f"生成的腳本: {output}")
-            return output
-            
-        except ValueError as e:
-            print(f"生成腳本時發生錯誤: {str(e)}")
-            raise HTTPException(
-                status_code=400,
-                detail=str(e)
-            )
-        except Exception as e:
-            print(f"生成腳本時發生未預期錯誤: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"生成腳本時發生錯誤: {str(e)}"
-            )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"處理請求時發生未預期錯誤: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"處理請求時發生錯誤: {str(e)}"
-        )
+    print(f"收到 arXiv 請求: {request}")
+
+    job = await submit_arxiv_job(request)
+    await job.wait()
+    # 腳本格式不正確、arXiv ID 無效等 ValueError 與改為背景工作前相同，回傳 400
+    output = job_output(job, client_errors=(ValueError,))
+    print(f"生成的腳本: {output}")
+    return output
+
+
+
+def stream_job_ndjson(job: Job) -> StreamingResponse:
+    """以 NDJSON 串流工作事件：大綱(plan)、逐段對話(dialogue)，最後是完整腳本(complete)"""
+    async def generate():
+        async for event in job.stream_events():
+            yield json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n'
+
+    return StreamingResponse(
+        generate(),
+        media_type='application/x-ndjson'
+    )
+
+
+@app.post("/api/generate/script/prompt/stream")
+async def generate_from_prompt_stream(inputs: PromptInput):
+    """從 Prompt 串流生成 Podcast 對話腳本"""
+    return stream_job_ndjson(submit_prompt_job(inputs))
+
+
+@app.post("/api/generate/script/pdf/stream")
+async def generate_from_pdf_stream(
+    pdf_file: UploadFile = File(...),
+    host_name: str = Form(...),
+    host_background: str = Form(...),
+    guest_name: str = Form(...),
+    guest_background: str = Form(...),
+    force_refresh: bool = Form(False)
+):
+    """從 PDF 串流生成 Podcast 對話腳本"""
+    job = await submit_pdf_job(pdf_file, host_name, host_background, guest_name, guest_background, force_refresh)
+    return stream_job_ndjson(job)
+
+
+@app.post("/api/generate/script/arxiv/stream")
+async def generate_script_from_arxiv_stream(request: ArxivScriptRequest):
+    """從 arXiv 論文串流生成 Podcast 對話腳本"""
+    return stream_job_ndjson(await submit_arxiv_job(request))
+
+
+
+@app.post("/api/jobs/script/prompt", status_code=202)
+async def submit_prompt_script_job(inputs: PromptInput):
+    """提交 Prompt 腳本生成工作，立即回傳工作 ID"""
+    job = submit_prompt_job(inputs)
+    return {"status": "success", "job": job.to_dict(include_result=False)}
+
+
+@app.post("/api/jobs/script/pdf", status_code=202)
+async def submit_pdf_script_job(
+    pdf_file: UploadFile = File(...),
+    host_name: str = Form(...),
+    host_background: str = Form(...),
+    guest_name: str = Form(...),
+    guest_background: str = Form(...),
+    force_refresh: bool = Form(False)
+):
+    """提交 PDF 腳本生成工作，立即回傳工作 ID"""
+    job = await submit_pdf_job(pdf_file, host_name, host_background, guest_name, guest_background, force_refresh)
+    return {"status": "success", "job": job.to_dict(include_result=False)}
+
+
+@app.post("/api/jobs/script/arxiv", status_code=202)
+async def submit_arxiv_script_job(request: ArxivScriptRequest):
+    """提交 arXiv 腳本生成工作，立即回傳工作 ID"""
+    job = await submit_arxiv_job(request)
+    return {"status": "success", "job": job.to_dict(include_result=False)}
+
+
+@app.get("/api/jobs")
+async def get_job_stats():
+    """查詢工作池目前的負載"""
+    return {"status": "success", **job_manager.stats()}
+
+
+@app.get("/api/health")
+async def health():
+    """存活檢查"""
+    return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+async def readiness():
+    """就緒檢查：圖與模型暖機完成前回傳 503"""
+    if not WARMUP_STATE.ready:
+        raise HTTPException(status_code=503, detail=WARMUP_STATE.to_dict())
+    return {"status": "ready", "warmup": WARMUP_STATE.to_dict()}
+
+
+@app.post("/api/warmup")
+async def trigger_warmup():
+    """手動觸發暖機(例如關閉 WARMUP_ON_STARTUP 時)"""
+    warm_up_in_background()
+    return {"status": "success", "warmup": WARMUP_STATE.to_dict()}
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """查詢各快取的使用狀況"""
+    return {
+        "status": "success",
+        "script": script_cache.stats(),
+        "extraction": EXTRACTION_CACHE.stats(),
+        "embedding": EMBEDDING_CACHE.stats(),
+        "query": QUERY_CACHE.stats(),
+        "tts": SEGMENT_CACHE.stats()
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查詢工作狀態、進度與結果"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"找不到工作：{job_id}")
+    return {"status": "success", "job": job.to_dict()}
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """以 Server-Sent Events 串流工作的進度與結果"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"找不到工作：{job_id}")
+
+    async def generate():
+        async for event in job.stream_events():
+            data = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {data}\n\n".encode('utf-8')
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={"Cache-Control": "no-cache"}
+    )
 
 
 
@@ -584,19 +957,6 @@ async def preview_voice(request: PreviewRequest):
             
             print(f"使用 Azure 設定 - Region: {speech_region}")
             
-            # 設定 Azure 語音服務
-            speech_config = speechsdk.SpeechConfig(
-                subscription=speech_key,
-                region=speech_region
-            )
-            
-            # 設定語音合成器
-            speech_config.speech_synthesis_voice_name = request.voice
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config,
-                audio_config=None
-            )
-            
             # 使用 SSML 合成語音
             ssml = f"""
             <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="zh-TW">
@@ -608,8 +968,8 @@ async def preview_voice(request: PreviewRequest):
             
             print(f"開始合成語音預覽 - Voice: {request.voice}")
             
-            # 合成語音
-            result = synthesizer.speak_ssml_async(ssml).get()
+            # 合成語音(使用行程共用、已預先連線的合成器)
+            result = await run_in_threadpool(SYNTHESIZER_POOL.speak_ssml, request.voice, ssml)
             
             if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
                 # 將音頻數據轉換為 BytesIO 對象
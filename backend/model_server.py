@@ -0,0 +1,115 @@
+"""
+共用的 embedding / 重排序模型服務
+
+多個 uvicorn worker 各自載入 BGE-M3 與 Flashrank 會佔用數倍記憶體；改由這個行程載入一份模型，
+worker 設定 MODEL_SERVER_URL 後透過 HTTP 呼叫。同時送來的查詢 embedding 會在服務端合併成一次前向計算。
+服務端與 worker 需使用相同的 QDRANT_RETRIEVAL_MODE；hybrid 模式下只載入一份 FlagEmbedding 的 BGE-M3，
+dense 向量與 sparse 權重由 /embed/hybrid 一次回傳。
+
+啟動：
+    uvicorn backend.model_server:app --uds /tmp/podgen-models.sock   # MODEL_SERVER_URL=unix:///tmp/podgen-models.sock
+    uvicorn backend.model_server:app --host 127.0.0.1 --port 8765    # MODEL_SERVER_URL=http://127.0.0.1:8765
+"""
+from typing import List
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from backend.models.embedding import (
+    RETRIEVAL_MODE,
+    BGEM3Model,
+    HybridDenseEmbeddings,
+    HybridEncoder,
+    LazyEmbeddings,
+    MicroBatchEmbeddings,
+    create_bge_m3,
+    embedding_model_id,
+    hybrid_model_id,
+)
+from backend.models.reranker import get_local_ranker
+
+
+app = FastAPI(title="PodGen model server")
+
+# 服務端一律使用本機模型，不受 MODEL_SERVER_URL 影響；向量快取在 worker 端，這裡不再快取
+if RETRIEVAL_MODE == "hybrid":
+    bge_m3 = BGEM3Model()
+    hybrid_encoder = HybridEncoder(bge_m3.encode, model=bge_m3)
+    dense_model = HybridDenseEmbeddings(hybrid_encoder)
+else:
+    hybrid_encoder = None
+    dense_model = MicroBatchEmbeddings(LazyEmbeddings(create_bge_m3))
+
+
+class TextsRequest(BaseModel):
+    texts: List[str]
+
+
+class QueryRequest(BaseModel):
+    text: str
+
+
+class RerankRequest(BaseModel):
+    query: str
+    passages: List[str]
+    top_n: int = Field(5, ge=1)
+
+
+# 端點使用同步函式，由 FastAPI 的執行緒池執行，並行的查詢才能被 MicroBatchEmbeddings 合併
+@app.post("/embed/documents")
+def embed_documents(request: TextsRequest):
+    return {"vectors": dense_model.embed_documents(request.texts)}
+
+
+@app.post("/embed/query")
+def embed_query(request: QueryRequest):
+    return {"vector": dense_model.embed_query(request.text)}
+
+
+@app.post("/embed/hybrid")
+def embed_hybrid(request: TextsRequest):
+    if hybrid_encoder is None:
+        raise HTTPException(status_code=400, detail="模型服務未以 hybrid 模式啟動(QDRANT_RETRIEVAL_MODE=hybrid)")
+    return {
+        "vectors": [
+            {"dense": dense, "sparse": {"indices": sparse.indices, "values": sparse.values}}
+            for dense, sparse in hybrid_encoder.encode(request.texts)
+        ]
+    }
+
+
+@app.post("/rerank")
+def rerank(request: RerankRequest):
+    from flashrank import RerankRequest as FlashrankRequest
+
+    passages = [{"id": i, "text": text} for i, text in enumerate(request.passages)]
+    results = get_local_ranker().rerank(FlashrankRequest(query=request.query, passages=passages))
+    return {
+        "results": [
+            {"index": result["id"], "score": float(result["score"])}
+            for result in results[:request.top_n]
+        ]
+    }
+
+
+@app.get("/info")
+def info():
+    """客戶端以此處的 model_id 作為向量快取的命名空間"""
+    return {
+        "model_id": hybrid_model_id() if hybrid_encoder else embedding_model_id(),
+        "retrieval_mode": RETRIEVAL_MODE,
+    }
+
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "embedding_loaded": dense_model.loaded,
+    }
+
+
+@app.on_event("startup")
+def load_models():
+    dense_model.load()
+    get_local_ranker()
@@ -1,9 +1,460 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentence_transformers import SentenceTransformer
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import SparseEmbeddings, SparseVector
 
-EMBEDDING_MODEL = HuggingFaceEmbeddings(
-    model_name='BAAI/bge-m3',
-    model_kwargs={'device': 'cuda'},
-    encode_kwargs={'normalize_embeddings': False}
-)
\ No newline at end of file
+from backend.database.embedding_cache import EMBEDDING_CACHE, EmbeddingCache
+
+EMBEDDING_MODEL_NAME = 'BAAI/bge-m3'
+# auto / cuda / mps / cpu
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto").lower()
+# auto / torch / onnx / onnx-int8；auto 在 GPU 上使用 torch，CPU 上使用 ONNX Runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+# 合併同時送來的 embed_query：最多等待的毫秒數與單批上限
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+
+# 檢索模式：dense 只用 BGE-M3 的 dense 向量；hybrid 每個點另存 BGE-M3 的 sparse 權重，由 Qdrant 以 RRF 融合兩路結果
+# hybrid 模式下 dense 與 sparse 由同一份 FlagEmbedding 模型一次計算
+RETRIEVAL_MODE = os.getenv("QDRANT_RETRIEVAL_MODE", "dense").lower()
+
+# 設定後改由共用模型服務(backend.model_server)計算向量，此行程不載入模型
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL")
+
+ONNX_INT8_DIR = Path(__file__).resolve().parent.parent / "stores" / "models" / "bge-m3-onnx-int8"
+ONNX_INT8_CONFIG = os.getenv("EMBEDDING_ONNX_INT8_CONFIG", "avx2")  # arm64 / avx2 / avx512 / avx512_vnni
+
+
+class LazyEmbeddings(Embeddings):
+    """第一次使用時才載入模型的 Embeddings，避免匯入模組時就載入數 GB 的模型"""
+
+    def __init__(self, factory: Callable[[], Embeddings]):
+        self._factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> Embeddings:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.load().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.load().embed_query(text)
+
+
+class MicroBatcher:
+    """
+    將多個執行緒同時送來的單筆請求合併成一次批次呼叫
+
+    第一個請求到達後最多再等待 max_wait_ms 收集其他請求，湊滿 max_batch 或逾時就一起送進 batch_fn。
+    """
+
+    def __init__(self, batch_fn: Callable[[List], List], max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS,
+                 max_batch: int = EMBEDDING_MAX_BATCH):
+        self.batch_fn = batch_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Queue = Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except Empty:
+                    break
+
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+
+
+class MicroBatchEmbeddings(Embeddings):
+    """
+    將多個執行緒同時呼叫的 embed_query 合併成一次模型前向計算
+
+    只適用於查詢與文件使用相同編碼方式的模型(BGE-M3 沒有查詢前綴)。
+    embed_documents 本身已是批次，直接轉給底層模型。
+    """
+
+    def __init__(self, embeddings: Embeddings, max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS,
+                 max_batch: int = EMBEDDING_MAX_BATCH):
+        self.embeddings = embeddings
+        self._batcher = MicroBatcher(embeddings.embed_documents, max_wait_ms, max_batch)
+
+    @property
+    def loaded(self) -> bool:
+        return getattr(self.embeddings, "loaded", True)
+
+    def load(self) -> Embeddings:
+        load = getattr(self.embeddings, "load", None)
+        return load() if load else self.embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._batcher.submit(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    在 Embeddings 前加上持久化向量快取，相同文字(標準化後)不會重複送進模型
+
+    model_id 可以是函式，第一次使用快取時才取得(例如向模型服務查詢)，匯入模組時不必連線。
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache,
+                 model_id: Union[str, Callable[[], str]]):
+        self.embeddings = embeddings
+        self.cache = cache
+        self._model_id = model_id
+
+    @property
+    def model_id(self) -> str:
+        if callable(self._model_id):
+            self._model_id = self._model_id()
+        return self._model_id
+
+    @property
+    def loaded(self) -> bool:
+        return getattr(self.embeddings, "loaded", True)
+
+    def load(self) -> Embeddings:
+        """載入底層模型並回傳，不經過快取"""
+        load = getattr(self.embeddings, "load", None)
+        return load() if load else self.embeddings
+
+    def _embed(self, kind: str, texts: List[str], embed_fn) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_id, kind, text) for text in texts]
+        vectors: Dict[str, List[float]] = self.cache.get_many(keys)
+
+        # 只計算未命中的文字，同一批中重複的文字也只算一次
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = dict(zip(missing, embed_fn(list(missing.values()))))
+            self.cache.set_many(computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+
+def detect_device(device: str = EMBEDDING_DEVICE) -> str:
+    """auto 時依序選擇 cuda、mps、cpu"""
+    if device != "auto":
+        return device
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def resolve_backend(device: str, backend: str = EMBEDDING_BACKEND) -> str:
+    if backend == "auto":
+        return "onnx" if device == "cpu" else "torch"
+    if backend not in ("torch", "onnx", "onnx-int8"):
+        raise ValueError(f"不支援的 embedding 後端：{backend}")
+    return backend
+
+
+def export_onnx_int8(model_name: str = EMBEDDING_MODEL_NAME, output_dir: Path = ONNX_INT8_DIR,
+                     quantization_config: str = ONNX_INT8_CONFIG) -> str:
+    """第一次使用時將模型匯出為 ONNX 並做 int8 動態量化，回傳量化後的檔名(相對於 output_dir)"""
+    file_name = f"onnx/model_qint8_{quantization_config}.onnx"
+    if not (output_dir / file_name).exists():
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save_pretrained(str(output_dir))
+        export_dynamic_quantized_onnx_model(model, quantization_config, str(output_dir))
+    return file_name
+
+
+def create_bge_m3(device: str = None, backend: str = None) -> Embeddings:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    device = detect_device(device or EMBEDDING_DEVICE)
+    backend = resolve_backend(device, backend or EMBEDDING_BACKEND)
+    print(f"載入 embedding 模型：{EMBEDDING_MODEL_NAME}，device={device}，backend={backend}")
+
+    model_name = EMBEDDING_MODEL_NAME
+    model_kwargs = {'device': device}
+    if backend == "onnx":
+        model_kwargs['backend'] = "onnx"
+        model_kwargs['model_kwargs'] = {'file_name': "onnx/model.onnx"}
+    elif backend == "onnx-int8":
+        model_kwargs['backend'] = "onnx"
+        model_kwargs['model_kwargs'] = {'file_name': export_onnx_int8()}
+        model_name = str(ONNX_INT8_DIR)
+
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs={'normalize_embeddings': False}
+    )
+
+
+def embedding_model_id(backend: str = EMBEDDING_BACKEND) -> str:
+    """向量快取用的模型識別；int8 量化的向量與原始模型不同，不能共用快取"""
+    if backend == "onnx-int8":
+        return f"{EMBEDDING_MODEL_NAME}:{backend}:{ONNX_INT8_CONFIG}"
+    return EMBEDDING_MODEL_NAME
+
+
+def create_embedding_model() -> Embeddings:
+    if MODEL_SERVER_URL:
+        from backend.models.remote import RemoteEmbeddings, get_model_server_client
+
+        client = get_model_server_client(MODEL_SERVER_URL)
+        # 向量由服務端的模型與後端產生，快取命名空間也以服務端的設定為準
+        return CachedEmbeddings(RemoteEmbeddings(client), EMBEDDING_CACHE,
+                                model_id=lambda: client.info()["model_id"])
+    return CachedEmbeddings(MicroBatchEmbeddings(LazyEmbeddings(create_bge_m3)), EMBEDDING_CACHE,
+                            model_id=embedding_model_id())
+
+
+class BGEM3Model:
+    """以 FlagEmbedding 載入的 BGE-M3，一次前向計算同時取得 dense 向量與 lexical(sparse) 權重，第一次使用時才載入"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = 16):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from FlagEmbedding import BGEM3FlagModel
+
+                    device = detect_device()
+                    print(f"載入 embedding 模型：{self.model_name}(dense + sparse)，device={device}")
+                    self._model = BGEM3FlagModel(self.model_name, use_fp16=device == "cuda", devices=device)
+        return self._model
+
+    def encode(self, texts: List[str]) -> List[Tuple[List[float], SparseVector]]:
+        output = self.load().encode(
+            texts,
+            batch_size=self.batch_size,
+            return_dense=True,
+            return_sparse=True,
+            return_colbert_vecs=False
+        )
+        return [
+            (dense.tolist(), to_sparse_vector(weights))
+            for dense, weights in zip(output["dense_vecs"], output["lexical_weights"])
+        ]
+
+
+def hybrid_model_id() -> str:
+    """hybrid 模式向量快取用的模型識別；GPU 上以 fp16 計算，與 fp32 的向量分開快取"""
+    if detect_device() == "cuda":
+        return f"{EMBEDDING_MODEL_NAME}:flag-fp16"
+    return EMBEDDING_MODEL_NAME
+
+
+class HybridEncoder:
+    """
+    dense 與 sparse 共用同一次 BGE-M3 計算、同一個向量快取與微批次
+
+    未命中快取的文字只計算一次，dense 向量與 sparse 權重一起寫入快取；
+    寫入時先取 dense 再取 sparse(查詢時亦同)，第二次取用直接命中快取，不會再跑一次模型。
+    cache 為 None 時不使用快取(模型服務端)。
+    """
+
+    OUTPUTS = ("dense", "sparse")
+
+    def __init__(self, encode: Callable[[List[str]], List[Tuple[List[float], SparseVector]]],
+                 cache: Optional[EmbeddingCache] = None,
+                 model_id: Union[str, Callable[[], str], None] = None,
+                 model: Optional[BGEM3Model] = None, batcher: Optional[MicroBatcher] = None):
+        self._encode = encode
+        self._batcher = batcher or MicroBatcher(encode)
+        self.cache = cache
+        self._model_id = model_id
+        # 本機模型，提供 loaded / load()；使用模型服務時為 None
+        self.model = model
+
+    @property
+    def model_id(self) -> str:
+        if callable(self._model_id):
+            self._model_id = self._model_id()
+        return self._model_id
+
+    @property
+    def loaded(self) -> bool:
+        return self.model.loaded if self.model else True
+
+    def load(self) -> "HybridEncoder":
+        """載入模型並回傳不經過快取的編碼器"""
+        if self.model:
+            self.model.load()
+        return HybridEncoder(self._encode, model=self.model, batcher=self._batcher)
+
+    def encode(self, texts: List[str]) -> List[Tuple[List[float], SparseVector]]:
+        """不經過快取計算 (dense, sparse)，單筆請求經過微批次合併"""
+        if len(texts) == 1:
+            return [self._batcher.submit(texts[0])]
+        return self._encode(texts)
+
+    def embed(self, output: str, kind: str, texts: List[str]) -> list:
+        position = self.OUTPUTS.index(output)
+        if self.cache is None:
+            return [pair[position] for pair in self.encode(texts)]
+
+        keys = {
+            name: [EmbeddingCache.make_key(self.model_id, cache_kind(name, kind), text) for text in texts]
+            for name in self.OUTPUTS
+        }
+        found = self.cache.get_many(keys[output])
+
+        # 只計算未命中的文字，同一批中重複的文字也只算一次
+        missing: Dict[str, int] = {}
+        for i, key in enumerate(keys[output]):
+            if key not in found and key not in missing:
+                missing[key] = i
+        if missing:
+            indices = list(missing.values())
+            computed = {}
+            for i, (dense, sparse) in zip(indices, self.encode([texts[i] for i in indices])):
+                computed[keys["dense"][i]] = dense
+                computed[keys["sparse"][i]] = pack_sparse(sparse)
+            self.cache.set_many(computed)
+            found.update({keys[output][i]: computed[keys[output][i]] for i in indices})
+
+        values = [found[key] for key in keys[output]]
+        return values if output == "dense" else [unpack_sparse(value) for value in values]
+
+
+def cache_kind(output: str, kind: str) -> str:
+    # dense 沿用 document / query，與非 hybrid 模式的快取項目相容
+    return kind if output == "dense" else f"{output}-{kind}"
+
+
+class HybridDenseEmbeddings(Embeddings):
+    """HybridEncoder 的 dense 輸出"""
+
+    def __init__(self, encoder: HybridEncoder):
+        self.encoder = encoder
+
+    @property
+    def loaded(self) -> bool:
+        return self.encoder.loaded
+
+    def load(self) -> Embeddings:
+        """載入底層模型並回傳，不經過快取"""
+        return HybridDenseEmbeddings(self.encoder.load())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encoder.embed("dense", "document", texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encoder.embed("dense", "query", [text])[0]
+
+
+class HybridSparseEmbeddings(SparseEmbeddings):
+    """HybridEncoder 的 lexical(sparse) 輸出"""
+
+    def __init__(self, encoder: HybridEncoder):
+        self.encoder = encoder
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        return self.encoder.embed("sparse", "document", texts)
+
+    def embed_query(self, text: str) -> SparseVector:
+        return self.encoder.embed("sparse", "query", [text])[0]
+
+
+def to_sparse_vector(lexical_weights) -> SparseVector:
+    """將 {token id: 權重} 轉為 Qdrant 的 sparse vector"""
+    items = sorted((int(token_id), float(weight)) for token_id, weight in lexical_weights.items())
+    return SparseVector(
+        indices=[token_id for token_id, _ in items],
+        values=[weight for _, weight in items]
+    )
+
+
+def pack_sparse(vector: SparseVector) -> List[float]:
+    """以 [index, value, index, value, ...] 存進向量快取；BGE-M3 的 token id 小於 2^24，float32 可精確表示"""
+    packed = []
+    for index, value in zip(vector.indices, vector.values):
+        packed.extend((float(index), value))
+    return packed
+
+
+def unpack_sparse(packed: List[float]) -> SparseVector:
+    return SparseVector(indices=[int(index) for index in packed[0::2]], values=list(packed[1::2]))
+
+
+def create_hybrid_encoder() -> HybridEncoder:
+    if MODEL_SERVER_URL:
+        from backend.models.remote import RemoteBGEM3, get_model_server_client
+
+        client = get_model_server_client(MODEL_SERVER_URL)
+        return HybridEncoder(RemoteBGEM3(client).encode, EMBEDDING_CACHE,
+                             model_id=lambda: client.info()["model_id"])
+    model = BGEM3Model()
+    return HybridEncoder(model.encode, EMBEDDING_CACHE, model_id=hybrid_model_id, model=model)
+
+
+if RETRIEVAL_MODE == "hybrid":
+    _hybrid_encoder = create_hybrid_encoder()
+    EMBEDDING_MODEL = HybridDenseEmbeddings(_hybrid_encoder)
+    SPARSE_EMBEDDING_MODEL = HybridSparseEmbeddings(_hybrid_encoder)
+else:
+    EMBEDDING_MODEL = create_embedding_model()
+    SPARSE_EMBEDDING_MODEL = None
@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import SparseVector
+from pydantic import ConfigDict
+
+
+class ModelServerClient:
+    """共用模型服務(backend.model_server)的 HTTP 客戶端，支援 http://host:port 與 unix:///path/to.sock"""
+
+    def __init__(self, url: str, timeout: float = 120):
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            base_url = "http://model-server"
+        else:
+            transport = httpx.HTTPTransport()
+            base_url = url.rstrip("/")
+        # httpx.Client 內部維護連線池，可在多執行緒間共用
+        self._client = httpx.Client(base_url=base_url, transport=transport, timeout=timeout)
+        self._info = None
+
+    def post(self, path: str, payload: Dict):
+        response = self._client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def info(self) -> Dict:
+        """服務端的模型設定(模型識別等)，服務啟動後不會改變，只查詢一次"""
+        if self._info is None:
+            response = self._client.get("/info")
+            response.raise_for_status()
+            self._info = response.json()
+        return self._info
+
+    def health(self) -> Dict:
+        response = self._client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+
+class RemoteEmbeddings(Embeddings):
+    """透過共用模型服務計算 dense 向量"""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.post("/embed/documents", {"texts": texts})["vectors"]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.post("/embed/query", {"text": text})["vector"]
+
+
+class RemoteBGEM3:
+    """透過共用模型服務以一次計算取得 BGE-M3 的 dense 向量與 sparse 權重(服務端需為 hybrid 模式)"""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+
+    def encode(self, texts: List[str]) -> List[Tuple[List[float], SparseVector]]:
+        vectors = self.client.post("/embed/hybrid", {"texts": texts})["vectors"]
+        return [(vector["dense"], SparseVector(**vector["sparse"])) for vector in vectors]
+
+
+class RemoteReranker(BaseDocumentCompressor):
+    """透過共用模型服務重排序，回傳格式與 FlashrankRerank 相同(metadata 中附上 relevance_score)"""
+
+    client: ModelServerClient
+    top_n: int = 5
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def compress_documents(self, documents: Sequence[Document], query: str,
+                           callbacks: Optional[Callbacks] = None) -> Sequence[Document]:
+        if not documents:
+            return []
+        results = self.client.post("/rerank", {
+            "query": query,
+            "passages": [doc.page_content for doc in documents],
+            "top_n": self.top_n
+        })["results"]
+
+        compressed = []
+        for result in results:
+            doc = documents[result["index"]]
+            compressed.append(Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "relevance_score": result["score"]}
+            ))
+        return compressed
+
+
+_clients: Dict[str, ModelServerClient] = {}
+
+
+def get_model_server_client(url: str) -> ModelServerClient:
+    """同一個位址共用一個客戶端(與其連線池)"""
+    if url not in _clients:
+        _clients.setdefault(url, ModelServerClient(url))
+    return _clients[url]
@@ -0,0 +1,47 @@
+import os
+import threading
+from typing import Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+RERANK_MODEL = 'ms-marco-MultiBERT-L-12'
+# 設定後改由共用模型服務(backend.model_server)重排序，此行程不載入模型
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL")
+
+_ranker = None
+_compressors: Dict[int, object] = {}
+_lock = threading.Lock()
+
+
+def get_local_ranker():
+    """取得本機的 Flashrank 模型，整個行程只載入一份"""
+    global _ranker
+    if _ranker is None:
+        with _lock:
+            if _ranker is None:
+                from flashrank import Ranker
+
+                _ranker = Ranker(model_name=RERANK_MODEL)
+    return _ranker
+
+
+def get_reranker(top_n: int = 5):
+    """取得共用的重排序器，模型在第一次使用時才載入；設定 MODEL_SERVER_URL 時改用共用模型服務"""
+    compressor = _compressors.get(top_n)
+    if compressor is not None:
+        return compressor
+
+    if MODEL_SERVER_URL:
+        from backend.models.remote import RemoteReranker, get_model_server_client
+
+        compressor = RemoteReranker(client=get_model_server_client(MODEL_SERVER_URL), top_n=top_n)
+    else:
+        from langchain.retrievers.document_compressors import FlashrankRerank
+
+        compressor = FlashrankRerank(client=get_local_ranker(), model=RERANK_MODEL, top_n=top_n)
+
+    with _lock:
+        return _compressors.setdefault(top_n, compressor)
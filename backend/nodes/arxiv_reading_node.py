@@ -119,7 +119,7 @@ def arxiv_reading_node(state):
     url = state['arxiv_url']
     arxiv_dict = get_arxiv_data(url)
 
-    return {"content": arxiv_dict['content']}
+    return {"content": arxiv_dict['content'], "arxiv_version": arxiv_dict.get('version')}
 
 
 if __name__ == "__main__":
@@ -1,36 +1,21 @@
-import pdfplumber
-import os
+from backend.database.extraction_cache import EXTRACTION_CACHE
 
-def pdf_to_markdown(pdf_content):
+
+def pdf_to_markdown(pdf_path):
     """將 PDF 內容轉換為 Markdown 格式"""
     try:
-        if not pdf_content or not isinstance(pdf_content, str):
+        if not pdf_path or not isinstance(pdf_path, str):
             raise ValueError("PDF 路徑無效")
-            
-        if not os.path.exists(pdf_content):
-            raise FileNotFoundError(f"找不到 PDF 檔案: {pdf_content}")
-            
-        markdown_content = []
-        with pdfplumber.open(pdf_content) as pdf:
-            if not pdf.pages:
-                raise ValueError("PDF 檔案沒有內容")
-                
-            # 處理每一頁
-            for i, page in enumerate(pdf.pages, 1):
-                text = page.extract_text() or ""
-                if text.strip():  # 如果頁面有內容
-                    # 添加頁碼標題
-                    markdown_content.append(f"\n## Page {i}\n")
-                    # 處理段落
-                    paragraphs = text.split('\n\n')
-                    for para in paragraphs:
-                        if para.strip():
-                            markdown_content.append(para.strip() + "\n\n")
-                            
-        if not markdown_content:
+
+        # 同一份 PDF 重複送入時直接使用快取的解析結果
+        extraction = EXTRACTION_CACHE.get_or_extract(pdf_path)
+        if not extraction.page_count:
+            raise ValueError("PDF 檔案沒有內容")
+
+        if not extraction.markdown:
             raise ValueError("無法從 PDF 提取任何文字內容")
             
-        return "".join(markdown_content)
+        return extraction.markdown
         
     except Exception as e:
         print(f"PDF 處理過程發生錯誤: {str(e)}")
@@ -64,4 +49,3 @@ if __name__ == "__main__":
         print(pdf_markdown)
 
     print_pdf(r"backend\stores\temp\20241125_131213\20241125_131213_original.pdf")
-
@@ -1,3 +1,5 @@
+from langchain_core.callbacks import dispatch_custom_event
+
 from backend.chains.plan_chain import plan_chain
 
 
@@ -14,5 +16,8 @@ def planning_node(state):
         "guest_background": state.get('guest_background', '來賓是一位資深的領域學者，擁有豐富的研究經驗，擅長以輕鬆有趣的方式解釋複雜的議題，並將其轉化為聽眾容易理解的內容。')
     })
 
+    # 大綱完成後立即送出，串流端點會在逐段對話之前先收到大綱
+    dispatch_custom_event("plan", {"title": result['title'], "plan": result['plan']})
+
     return {"title": result['title'], "plan": result['plan']}
 
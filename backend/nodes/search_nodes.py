@@ -3,14 +3,19 @@ import arxiv
 from langchain_core.messages import SystemMessage
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_community.document_loaders import WikipediaLoader
-from langchain.retrievers.document_compressors import FlashrankRerank
 from langchain.retrievers import ContextualCompressionRetriever
 
 from backend.states import InterviewState
 from backend.schema import SearchQuery
 from backend.models.llm import LLM
-from backend.database.qdrant_manager import QdrantManager
-from backend.models.embedding import EMBEDDING_MODEL
+import os
+
+from backend.database.qdrant_manager import RETRIEVAL_MODE, get_qdrant_manager
+from backend.database.query_cache import QUERY_CACHE
+from backend.models.reranker import get_reranker
+
+# 送入重排序的候選數量：hybrid 檢索已由 RRF 融合關鍵字與語意結果，較少的候選即可維持召回率
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "30" if RETRIEVAL_MODE == "hybrid" else "100"))
 
 # Search query writing
 search_instructions = SystemMessage(content=f"""You will be given a conversation between an analyst and an expert. 
@@ -135,27 +140,23 @@ def search_db_node(state: InterviewState):
     structured_llm = LLM.with_structured_output(SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
 
-    # Running search
-    qdrant_manager = QdrantManager(EMBEDDING_MODEL)
-    vectordb = qdrant_manager.get_vectordb()
-    # search_docs = vectordb.similarity_search(search_query.search_query, k=10)
-
-    # Create retriever
-    retriever = vectordb.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 100}
-    )
+    reference_folders = state.get("reference_folders")
 
+    def retrieve(query):
+        # Create retriever(指定參考資料時只在這些資料夾中搜尋)
+        qdrant_manager = get_qdrant_manager()
+        retriever = qdrant_manager.get_retriever(k=SEARCH_CANDIDATES, reference_folders=reference_folders)
 
-    RERANK_MODEL = 'ms-marco-MultiBERT-L-12'
-
-    compressor = FlashrankRerank(model=RERANK_MODEL, top_n=5)  # K2, Top5 Answers
-    compression_retriever = ContextualCompressionRetriever(
-        base_compressor=compressor, 
-        base_retriever=retriever
-    )
+        compressor = get_reranker(top_n=5)  # K2, Top5 Answers
+        compression_retriever = ContextualCompressionRetriever(
+            base_compressor=compressor, 
+            base_retriever=retriever
+        )
+        return compression_retriever.invoke(query)
 
-    search_docs = compression_retriever.invoke(search_query.search_query)
+    # Running search(與先前相近的查詢直接沿用重排序後的結果)
+    scope = ("search_db", SEARCH_CANDIDATES, 5, tuple(sorted(reference_folders or [])))
+    search_docs = QUERY_CACHE.get_or_retrieve(search_query.search_query, scope, retrieve)
 
     # Format
     formatted_search_docs = "\n\n---\n\n".join(
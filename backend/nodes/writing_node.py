@@ -1,3 +1,5 @@
+from langchain_core.callbacks import dispatch_custom_event
+
 from backend.chains.write_chain import write_chain
 
 def writing_node(state):
@@ -7,7 +9,7 @@ def writing_node(state):
     dialogue = state.get('dialogue', [])
     plan = state['plan']
 
-    for subplan in plan:
+    for i, subplan in enumerate(plan):
         # Invoke the write_chain
         result = write_chain.invoke({
             "instruction": state.get('instruction', '請根據背景知識所提供的論文內容，非常深入的探討論文的技術內容，以幫助聽眾完全理解論文的內容，盡量引用論文中的數據或是其論點'),
@@ -24,6 +26,14 @@ def writing_node(state):
         
         dialogue += result['dialogue']
 
+        # 每完成一個段落就送出，讓前端與語音合成可以先行處理
+        dispatch_custom_event("dialogue", {
+            "index": i,
+            "total": len(plan),
+            "subplan_num": subplan['subplan_num'],
+            "dialogue": result['dialogue']
+        })
+
     return {"dialogue": dialogue}
 
 
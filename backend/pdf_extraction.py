@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import pdfplumber
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 解析器版本：解析或 Markdown 組合邏輯改變時需更新，舊的解析快取即不再命中
+EXTRACTOR_VERSION = f"1-pdfplumber{pdfplumber.__version__}"
+
+# 平行解析設定：工作行程數與每個工作分配的頁數
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EXTRACT_CHUNK_PAGES = int(os.getenv("PDF_EXTRACT_CHUNK_PAGES", "16"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+class PdfExtraction:
+    """PDF 單次解析的結果：Markdown、純文字與每一頁在兩者中的位置"""
+
+    def __init__(self, markdown: str, text: str, pages: List[Dict]):
+        self.markdown = markdown
+        self.text = text
+        self.pages = pages
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+
+def page_to_markdown(page_num: int, text: str) -> str:
+    """將單頁文字轉為 Markdown，空白頁回傳空字串"""
+    if not text.strip():
+        return ""
+    # 添加頁碼標題並處理段落
+    parts = [f"\n## Page {page_num}\n"]
+    for para in text.split('\n\n'):
+        if para.strip():
+            parts.append(para.strip() + "\n\n")
+    return "".join(parts)
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """取得共用的行程池，工作數量改變時重建"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # 使用 spawn，避免在多執行緒的伺服器行程中 fork
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_workers = workers
+        return _executor
+
+
+def extract_page_texts(pdf_path: str, start: int, end: int) -> List[str]:
+    """解析第 start 到 end-1 頁(從 0 起算)的文字，供工作行程以檔案路徑獨立開檔"""
+    with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def build_extraction(page_texts: List[str]) -> PdfExtraction:
+    """依頁面順序組合 Markdown、純文字與每頁的起訖位置"""
+    markdown_parts, text_parts, pages = [], [], []
+    markdown_len = text_len = 0
+
+    for i, text in enumerate(page_texts, 1):
+        page_markdown = page_to_markdown(i, text)
+
+        # 純文字以換行串接各頁
+        if i > 1:
+            text_parts.append("\n")
+            text_len += 1
+
+        pages.append({
+            "page": i,
+            "markdown_start": markdown_len,
+            "markdown_end": markdown_len + len(page_markdown),
+            "text_start": text_len,
+            "text_end": text_len + len(text),
+        })
+        markdown_parts.append(page_markdown)
+        text_parts.append(text)
+        markdown_len += len(page_markdown)
+        text_len += len(text)
+
+    return PdfExtraction("".join(markdown_parts), "".join(text_parts), pages)
+
+
+def extract_pdf(pdf_source, workers: Optional[int] = None,
+                chunk_pages: Optional[int] = None) -> PdfExtraction:
+    """
+    逐頁解析 PDF 一次，同時產生 Markdown 與純文字
+
+    以檔案路徑傳入且頁數超過 chunk_pages 時，會將頁面範圍分給多個工作行程平行解析，
+    再依頁面順序合併結果
+
+    Args:
+        pdf_source: PDF 檔案路徑或檔案物件(檔案物件只能在目前行程中解析)
+        workers: 工作行程數，預設為 PDF_EXTRACT_WORKERS，1 表示不平行
+        chunk_pages: 每個工作分配的頁數，預設為 PDF_EXTRACT_CHUNK_PAGES
+
+    Returns:
+        PdfExtraction，pages 中記錄每頁在 markdown / text 中的起訖位置
+    """
+    workers = workers or EXTRACT_WORKERS
+    chunk_pages = chunk_pages or EXTRACT_CHUNK_PAGES
+    is_path = isinstance(pdf_source, (str, os.PathLike))
+
+    if is_path and not os.path.exists(pdf_source):
+        raise FileNotFoundError(f"找不到 PDF 檔案: {pdf_source}")
+
+    with pdfplumber.open(pdf_source) as pdf:
+        page_count = len(pdf.pages)
+        if not is_path or workers <= 1 or page_count <= chunk_pages:
+            return build_extraction([page.extract_text() or "" for page in pdf.pages])
+
+    # 依頁面範圍分配給工作行程，各自以檔案路徑開檔，結果依提交順序合併
+    executor = get_executor(workers)
+    pdf_path = os.fspath(pdf_source)
+    futures = [
+        executor.submit(extract_page_texts, pdf_path, start, min(start + chunk_pages, page_count))
+        for start in range(0, page_count, chunk_pages)
+    ]
+    page_texts = []
+    for future in futures:
+        page_texts.extend(future.result())
+    return build_extraction(page_texts)
+
+
+if __name__ == "__main__":
+    import sys
+
+    extraction = extract_pdf(sys.argv[1])
+    print(f"頁數：{extraction.page_count}")
+    print(extraction.markdown[:2000])
@@ -23,4 +23,5 @@ class ArxivScriptRequest(BaseModel):
     host_name: str = Field(..., description="主持人名稱")
     host_background: str = Field(..., description="主持人背景")
     guest_name: str = Field(..., description="來賓名稱")
-    guest_background: str = Field(..., description="來賓背景")
\ No newline at end of file
+    guest_background: str = Field(..., description="來賓背景")
+    force_refresh: bool = Field(False, description="忽略快取，重新生成腳本")
\ No newline at end of file
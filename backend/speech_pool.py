@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import azure.cognitiveservices.speech as speechsdk
+import dotenv
+
+dotenv.load_dotenv()
+
+DEFAULT_OUTPUT_FORMAT = speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm
+DEFAULT_VOICES = ("zh-TW-HsiaoChenNeural", "zh-TW-YunJheNeural")
+
+# 每個 (語音, 輸出格式) 最多保留的閒置合成器數量，以及啟動時預先建立的數量
+SYNTHESIZER_POOL_SIZE = int(os.getenv("SYNTHESIZER_POOL_SIZE", "8"))
+SYNTHESIZER_WARM_COUNT = int(os.getenv("SYNTHESIZER_WARM_COUNT", "2"))
+# 閒置超過此秒數的合成器，借出前重新開啟連線(服務端會關閉閒置的連線)
+SYNTHESIZER_IDLE_TIMEOUT = float(os.getenv("SYNTHESIZER_IDLE_TIMEOUT", "180"))
+
+# 這些原因造成的取消通常是連線問題，換一個新的合成器重試一次
+RETRYABLE_CANCELLATIONS = (
+    speechsdk.CancellationErrorCode.ConnectionFailure,
+    speechsdk.CancellationErrorCode.ServiceTimeout,
+    speechsdk.CancellationErrorCode.ServiceUnavailable,
+    speechsdk.CancellationErrorCode.ServiceError,
+)
+
+
+class PooledSynthesizer:
+    """SpeechSynthesizer 與其預先開啟的連線"""
+
+    def __init__(self, synthesizer: speechsdk.SpeechSynthesizer, connection: speechsdk.Connection):
+        self.synthesizer = synthesizer
+        self.connection = connection
+        self.last_used = time.monotonic()
+
+    def reopen(self):
+        self.connection.open(True)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception as e:
+            print(f"關閉語音合成連線失敗：{str(e)}")
+
+
+class SynthesizerPool:
+    """
+    行程共用的 SpeechSynthesizer 池，以 (語音, 輸出格式) 為鍵
+
+    合成器建立時即以 Connection.open(True) 預先建立連線，之後重複使用，不必每段重新連線與 TLS 握手。
+    閒置過久的合成器借出前先重新開啟連線。同一個合成器同時只會借給一個執行緒；
+    合成失敗的合成器直接丟棄，不放回池中，連線問題造成的取消會以新的合成器重試一次。
+    """
+
+    def __init__(self, max_idle: int = SYNTHESIZER_POOL_SIZE, idle_timeout: float = SYNTHESIZER_IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self.reopened = 0
+        self.retried = 0
+        self._idle: Dict[Tuple[str, object], List[PooledSynthesizer]] = {}
+        self._configs: Dict[object, speechsdk.SpeechConfig] = {}
+        self._lock = threading.Lock()
+
+    def speech_config(self, output_format=DEFAULT_OUTPUT_FORMAT) -> speechsdk.SpeechConfig:
+        """同一個輸出格式共用一份 SpeechConfig"""
+        with self._lock:
+            if output_format not in self._configs:
+                config = speechsdk.SpeechConfig(
+                    subscription=os.environ.get('SPEECH_KEY'),
+                    region=os.environ.get('SPEECH_REGION')
+                )
+                config.set_speech_synthesis_output_format(output_format)
+                self._configs[output_format] = config
+            return self._configs[output_format]
+
+    def _create(self, voice_name: str, output_format) -> PooledSynthesizer:
+        config = self.speech_config(output_format)
+        synthesizer = speechsdk.SpeechSynthesizer(speech_config=config, audio_config=None)
+        connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+        connection.open(True)
+        with self._lock:
+            self.created += 1
+        return PooledSynthesizer(synthesizer, connection)
+
+    def checkout(self, voice_name: str, output_format=DEFAULT_OUTPUT_FORMAT) -> PooledSynthesizer:
+        with self._lock:
+            idle = self._idle.get((voice_name, output_format))
+            pooled = idle.pop() if idle else None
+            if pooled:
+                self.reused += 1
+        if pooled is None:
+            return self._create(voice_name, output_format)
+        if time.monotonic() - pooled.last_used > self.idle_timeout:
+            try:
+                pooled.reopen()
+            except Exception as e:
+                print(f"重新開啟語音合成連線失敗，改用新的合成器：{str(e)}")
+                pooled.close()
+                return self._create(voice_name, output_format)
+            with self._lock:
+                self.reopened += 1
+        return pooled
+
+    def checkin(self, voice_name: str, pooled: PooledSynthesizer, output_format=DEFAULT_OUTPUT_FORMAT):
+        with self._lock:
+            idle = self._idle.setdefault((voice_name, output_format), [])
+            if len(idle) < self.max_idle:
+                idle.append(pooled)
+                return
+        pooled.close()
+
+    def speak_ssml(self, voice_name: str, ssml: str, output_format=DEFAULT_OUTPUT_FORMAT) -> speechsdk.SpeechSynthesisResult:
+        """以池中的合成器合成 SSML；合成被取消時丟棄該合成器，連線問題則以新的合成器重試一次"""
+        for attempt in range(2):
+            pooled = self.checkout(voice_name, output_format)
+            try:
+                result = pooled.synthesizer.speak_ssml_async(ssml).get()
+            except BaseException:
+                pooled.close()
+                raise
+            if result.reason != speechsdk.ResultReason.Canceled:
+                pooled.last_used = time.monotonic()
+                self.checkin(voice_name, pooled, output_format)
+                return result
+
+            pooled.close()
+            details = result.cancellation_details
+            if attempt > 0 or details.error_code not in RETRYABLE_CANCELLATIONS:
+                return result
+            print(f"語音合成連線中斷，以新的合成器重試：{details.error_details}")
+            # 同一個語音的其他閒置合成器很可能也已斷線，一併丟棄，重試時建立新的合成器
+            self.discard(voice_name, output_format)
+            with self._lock:
+                self.retried += 1
+        return result
+
+    def discard(self, voice_name: str, output_format=DEFAULT_OUTPUT_FORMAT):
+        """關閉某個語音的所有閒置合成器(例如連線逾時被服務端關閉後)"""
+        with self._lock:
+            idle = self._idle.pop((voice_name, output_format), [])
+        for pooled in idle:
+            pooled.close()
+
+    def warm(self, voices: Iterable[str] = DEFAULT_VOICES, count: int = SYNTHESIZER_WARM_COUNT,
+             output_format=DEFAULT_OUTPUT_FORMAT):
+        """預先為指定語音建立並連線 count 個合成器"""
+        for voice_name in voices:
+            for pooled in [self._create(voice_name, output_format) for _ in range(count)]:
+                self.checkin(voice_name, pooled, output_format)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "idle": {f"{voice}|{getattr(fmt, 'name', fmt)}": len(items) for (voice, fmt), items in self._idle.items()},
+                "created": self.created,
+                "reused": self.reused,
+                "reopened": self.reopened,
+                "retried": self.retried,
+            }
+
+
+SYNTHESIZER_POOL = SynthesizerPool()
@@ -1,14 +1,20 @@
 import os
 import json
 import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, AsyncGenerator
 import azure.cognitiveservices.speech as speechsdk
-from pydub import AudioSegment
 import dotenv
 import datetime
 from fastapi.responses import StreamingResponse
 import shutil
 
+from backend.speech_pool import SYNTHESIZER_POOL, DEFAULT_OUTPUT_FORMAT
+from backend.database.segment_cache import SEGMENT_CACHE
+from backend.audio_assembly import WavAssembler, merge_wav_files
 
 dotenv.load_dotenv()
 
@@ -16,6 +22,40 @@ dotenv.load_dotenv()
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_AUDIO_DIR = os.path.join(BACKEND_DIR, "stores", "audio")
 
+# 單一請求同時合成的段落數，以及整個行程合成用執行緒的上限(所有請求共用)
+SYNTHESIS_CONCURRENCY = int(os.getenv("SYNTHESIS_CONCURRENCY", "4"))
+SYNTHESIS_MAX_WORKERS = int(os.getenv("SYNTHESIS_MAX_WORKERS", "8"))
+
+# SSML 模板有變動時需更新版本，快取的段落音檔才不會沿用舊模板的結果
+SSML_TEMPLATE_VERSION = "1"
+
+_synthesis_executor = None
+_synthesis_executor_lock = threading.Lock()
+
+
+def get_synthesis_executor() -> ThreadPoolExecutor:
+    """語音合成專用的執行緒池，避免佔用 asyncio 預設執行緒池"""
+    global _synthesis_executor
+    if _synthesis_executor is None:
+        with _synthesis_executor_lock:
+            if _synthesis_executor is None:
+                _synthesis_executor = ThreadPoolExecutor(
+                    max_workers=SYNTHESIS_MAX_WORKERS,
+                    thread_name_prefix="tts"
+                )
+    return _synthesis_executor
+
+def build_ssml(text: str, voice_name: str, speed: float = 1.0, pitch: int = 0) -> str:
+    return f"""
+            <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="zh-TW">
+                <voice name="{voice_name}">
+                    <prosody rate="{speed}" pitch="{pitch}st">
+                        {text}
+                    </prosody>
+                </voice>
+            </speak>
+            """
+
 class VoiceProfile:
     def __init__(self, role: str, voice_name: str, speed: float = 1.0, pitch: int = 0):
         self.role = role
@@ -59,13 +99,9 @@ class PodcastSynthesizer:
         print(f"段落音檔目錄：{self.segments_dir}")
         self._ensure_directories()
         
-        self.speech_config = speechsdk.SpeechConfig(
-            subscription=os.environ.get('SPEECH_KEY'),
-            region=os.environ.get('SPEECH_REGION')
-        )
-        self.speech_config.set_speech_synthesis_output_format(
-            speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm
-        )
+        # 所有合成器共用行程層級的 SpeechConfig 與預先連線的合成器池
+        self.output_format = DEFAULT_OUTPUT_FORMAT
+        self.speech_config = SYNTHESIZER_POOL.speech_config(self.output_format)
 
     def _ensure_directories(self):
         """確保所有需要的目錄存在"""
@@ -73,6 +109,16 @@ class PodcastSynthesizer:
         os.makedirs(self.temp_dir, exist_ok=True)
         os.makedirs(self.segments_dir, exist_ok=True)
 
+    def audio_url(self, path: str) -> str:
+        """stores/audio 下檔案對應的 /audio 靜態路徑 URL"""
+        relative_path = os.path.relpath(path, SEGMENT_CACHE.audio_dir)
+        return "/audio/" + relative_path.replace(os.sep, "/")
+
+    def segment_cache_key(self, text: str, voice_name: str, speed: float = 1.0, pitch: int = 0) -> str:
+        return SEGMENT_CACHE.make_key(
+            text, voice_name, speed, pitch, self.output_format.name, SSML_TEMPLATE_VERSION
+        )
+
     def synthesize_segment(self, text: str, voice_name: str, output_file: str, speed: float = 1.0, pitch: int = 0) -> bool:
         """合成單一段落的語音"""
         try:
@@ -83,27 +129,23 @@ class PodcastSynthesizer:
             print(f"- 文本內容: {text[:50]}...")
             print(f"- 輸出檔案: {output_file}")
 
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=self.speech_config,
-                audio_config=None
-            )
+            # 相同台詞與語音設定已合成過時直接複製快取的音檔
+            key = self.segment_cache_key(text, voice_name, speed, pitch)
+            cached_path = SEGMENT_CACHE.get(key)
+            if cached_path:
+                shutil.copyfile(cached_path, output_file)
+                print("✓ 使用快取的語音段落")
+                return True
 
-            ssml = f"""
-            <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="zh-TW">
-                <voice name="{voice_name}">
-                    <prosody rate="{speed}" pitch="{pitch}st">
-                        {text}
-                    </prosody>
-                </voice>
-            </speak>
-            """
+            ssml = build_ssml(text, voice_name, speed, pitch)
             print(f"- SSML內容:\n{ssml}")
 
-            result = synthesizer.speak_ssml_async(ssml).get()
+            result = SYNTHESIZER_POOL.speak_ssml(voice_name, ssml, self.output_format)
             
             if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
                 with open(output_file, "wb") as audio_file:
                     audio_file.write(result.audio_data)
+                SEGMENT_CACHE.put(key, result.audio_data)
                 print("✓ 語音合成成功")
                 return True
             else:
@@ -122,15 +164,8 @@ class PodcastSynthesizer:
             return False
 
     def merge_audio_files(self, audio_files: List[str], output_file: str):
-        """合併多個音檔"""
-        combined = AudioSegment.empty()
-        for audio_file in audio_files:
-            segment = AudioSegment.from_wav(audio_file)
-            combined += segment
-            # 在每段之間加入 0.5 秒的靜音
-            combined += AudioSegment.silent(duration=500)
-        
-        combined.export(output_file, format="wav")
+        """合併多個音檔，在每段之後加入 0.5 秒的靜音(串流寫入，不將整集載入記憶體)"""
+        return merge_wav_files(audio_files, output_file, gap_ms=500)
 
     def generate_podcast(self, script_data: Dict, filename: str = None) -> Dict:
         """生成 Podcast 音檔，並將音檔路徑加入原始腳本資料中"""
@@ -352,116 +387,186 @@ class PodcastSynthesizer:
                 "message": f"生成過程發生錯誤: {str(e)}"
             }
 
-    async def generate_segment(self, text: str, voice_name: str, output_file: str) -> bool:
-        """非阻塞的語音合成"""
+    def _generate_segment_blocking(self, text: str, voice_profile: VoiceProfile, key: str) -> bool:
+        ssml = build_ssml(text, voice_profile.voice_name, voice_profile.speed, voice_profile.pitch)
+        result = SYNTHESIZER_POOL.speak_ssml(voice_profile.voice_name, ssml, self.output_format)
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            SEGMENT_CACHE.put(key, result.audio_data)
+            return True
+        if result.reason == speechsdk.ResultReason.Canceled:
+            print(f"語音合成取消：{result.cancellation_details.error_details}")
+        return False
+
+    async def generate_segment(self, text: str, voice_profile: VoiceProfile, key: str) -> bool:
+        """非阻塞的語音合成，在語音合成專用的執行緒池中執行，結果寫入段落快取"""
         try:
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=self.speech_config, 
-                audio_config=None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                get_synthesis_executor(),
+                self._generate_segment_blocking,
+                text,
+                voice_profile,
+                key
             )
-
-            ssml = f"""
-            <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="zh-TW">
-                <voice name="{voice_name}">
-                    {text}
-                </voice>
-            </speak>
-            """
-
-            # 使用 asyncio 來非阻塞地等待結果
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, 
-                lambda: synthesizer.speak_ssml_async(ssml).get()
-            )
-            
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                with open(output_file, "wb") as audio_file:
-                    audio_file.write(result.audio_data)
-                return True
-            return False
-
         except Exception as e:
             print(f"語音合成失敗：{str(e)}")
             return False
 
-    async def process_segments(self, script_data: Dict):
-        """使用異步方式處理所有段落"""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        session_dir = os.path.join(self.segments_dir, timestamp)
-        os.makedirs(session_dir, exist_ok=True)
+    async def process_segments(self, script_data: Dict, concurrency: int = None):
+        """
+        同時合成多個段落，並依對話順序回傳結果
 
+        最多 concurrency 個段落同時送出合成；前面的段落都完成後才送出下一段的 audio 事件，
+        因此事件順序與對話順序一致。每個事件附上該段的合成耗時(latency_ms)。
+        段落音檔存放在內容定址的段落快取中，已合成過的台詞(相同文字與語音設定)不會再呼叫 Azure。
+        完成的段落會依序接到整集音檔後面，最後送出 complete 事件，附上整集音檔 URL 與每段的起訖秒數。
+        """
         host_name = script_data.get("host_name", "主持人")
-        guest_name = script_data.get("guest_name", "來賓")
+        dialogue = script_data["dialogue"]
+        total = len(dialogue)
+        concurrency = concurrency or SYNTHESIS_CONCURRENCY
 
-        print(f"開始處理對話段落")
+        print(f"開始處理對話段落(同時合成 {concurrency} 段)")
         print(f"使用語音設定 - 主持人: {self.voice_config.profiles['主持人'].voice_name}")
         print(f"使用語音設定 - 來賓: {self.voice_config.profiles['來賓'].voice_name}")
 
-        for i, segment in enumerate(script_data["dialogue"]):
-            try:
-                speaker = segment["speaker"]
-                content = segment["content"]
-                
-                # 根據說話者選擇語音
-                voice_profile = (
-                    self.voice_config.profiles["主持人"] 
-                    if speaker == host_name 
-                    else self.voice_config.profiles["來賓"]
-                )
-                
-                print(f"\n處理第 {i+1} 段對話:")
-                print(f"- 說話者: {speaker}")
-                print(f"- 使用語音: {voice_profile.voice_name}")
+        # asyncio.Semaphore 依等待順序放行，段落大致依對話順序開始合成，前綴能盡早完成
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def synthesize(i: int, voice_profile: VoiceProfile, key: str):
+            # 快取命中時不佔用合成名額
+            if SEGMENT_CACHE.get(key):
+                return True, 0.0, True
+            async with semaphore:
+                start = time.perf_counter()
+                success = await self.generate_segment(dialogue[i]["content"], voice_profile, key)
+                return success, (time.perf_counter() - start) * 1000, False
+
+        voices, keys = [], []
+        for segment in dialogue:
+            # 根據說話者選擇語音
+            voice_profile = (
+                self.voice_config.profiles["主持人"] 
+                if segment["speaker"] == host_name 
+                else self.voice_config.profiles["來賓"]
+            )
+            voices.append(voice_profile)
+            keys.append(self.segment_cache_key(
+                segment["content"], voice_profile.voice_name, voice_profile.speed, voice_profile.pitch
+            ))
 
-                # 生成檔案路徑
-                segment_filename = f"segment_{i:03d}.wav"
-                segment_file = os.path.join(session_dir, segment_filename)
-                
-                # 開始處理前先回報
-                yield {
-                    "type": "progress",
-                    "status": "processing",
-                    "index": i,
-                    "total": len(script_data["dialogue"]),
-                    "speaker": speaker,
-                    "content": content,
-                    "voice": voice_profile.voice_name
-                }
+        # 本次用到的段落在串流結束前不會被容量淘汰刪除
+        SEGMENT_CACHE.pin(keys)
+        tasks = [asyncio.create_task(synthesize(i, voices[i], keys[i])) for i in range(total)]
 
-                # 生成語音
-                success = await self.generate_segment(
-                    content,
-                    voice_profile.voice_name,
-                    segment_file
-                )
+        # 整集音檔先寫入 .part 檔，全部完成後才改名，避免提供寫到一半的檔案
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        episode_file = os.path.join(self.output_dir, f"podcast_{timestamp}_{uuid.uuid4().hex[:6]}.wav")
+        part_file = episode_file + ".part"
+        assembler = WavAssembler(part_file)
+        offsets = []
+        # 執行緒中的寫入無法取消；記下進行中的寫入，結束時先等它完成才關閉與刪除檔案
+        pending_write = None
+
+        async def run_assembler(func, *args):
+            nonlocal pending_write
+            pending_write = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            return await asyncio.shield(pending_write)
+
+        def append_segment(audio_file: str):
+            start, end = assembler.add_segment(audio_file)
+            assembler.add_silence(500)
+            return start, end
+
+        try:
+            yield {
+                "type": "start",
+                "total": total,
+                "concurrency": concurrency
+            }
+
+            for i, task in enumerate(tasks):
+                speaker = dialogue[i]["speaker"]
+                content = dialogue[i]["content"]
+                try:
+                    success, latency_ms, cached = await task
+                except Exception as e:
+                    print(f"處理段落 {i+1} 時發生錯誤: {str(e)}")
+                    yield {
+                        "type": "error",
+                        "index": i,
+                        "message": str(e)
+                    }
+                    continue
 
                 if success:
-                    relative_url = f"/audio/segments/{timestamp}/segment_{i:03d}.wav"
+                    # 依對話順序接到整集音檔後面，每段之後加入 0.5 秒靜音(與 merge_audio_files 相同)
+                    try:
+                        start, end = await run_assembler(
+                            append_segment, str(SEGMENT_CACHE.path_for(keys[i]))
+                        )
+                    except Exception as e:
+                        print(f"第 {i+1} 段加入整集音檔失敗: {str(e)}")
+                        yield {
+                            "type": "error",
+                            "index": i,
+                            "message": f"第 {i+1} 段加入整集音檔失敗：{str(e)}"
+                        }
+                        continue
+                    offsets.append({"index": i, "start": round(start, 3), "end": round(end, 3)})
+
+                    relative_url = SEGMENT_CACHE.url_for(keys[i])
                     yield {
                         "type": "audio",
                         "status": "success",
                         "index": i,
-                        "total": len(script_data["dialogue"]),
+                        "total": total,
                         "speaker": speaker,
                         "content": content,
                         "audio_file": relative_url,
-                        "voice": voice_profile.voice_name
+                        "voice": voices[i].voice_name,
+                        "latency_ms": round(latency_ms, 1),
+                        "cached": cached,
+                        "start": round(start, 3),
+                        "end": round(end, 3)
                     }
                 else:
                     yield {
                         "type": "error",
                         "status": "error",
                         "index": i,
-                        "message": f"第 {i+1} 段語音生成失敗"
+                        "message": f"第 {i+1} 段語音生成失敗",
+                        "latency_ms": round(latency_ms, 1)
                     }
-            except Exception as e:
-                print(f"處理段落 {i+1} 時發生錯誤: {str(e)}")
+
+            await run_assembler(assembler.close)
+            if offsets:
+                os.replace(part_file, episode_file)
+                yield {
+                    "type": "complete",
+                    "total": total,
+                    "full_audio": self.audio_url(episode_file),
+                    "duration": round(assembler.duration, 3),
+                    "segments": offsets
+                }
+            else:
                 yield {
                     "type": "error",
-                    "index": i,
-                    "message": str(e)
+                    "message": "沒有任何段落合成成功，未產生完整音檔"
                 }
+        finally:
+            # 用戶端中斷時取消尚未開始的段落，並移除未完成的整集音檔
+            for task in tasks:
+                task.cancel()
+            if pending_write is not None and not pending_write.done():
+                try:
+                    await asyncio.shield(pending_write)
+                except Exception:
+                    pass
+            assembler.close()
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            SEGMENT_CACHE.unpin(keys)
 
 def synthesize_podcast(
     script_data: Dict, 
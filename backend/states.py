@@ -17,6 +17,7 @@ class InterviewState(MessagesState):
     analyst: Analyst # Analyst asking questions
     interview: str # Interview transcript
     sections: list # Final key we duplicate in outer state for Send() API
+    reference_folders: List[str] # Restrict vector search to these uploaded references
 
 class ResearchGraphState(TypedDict):
     topic: str # Research topic
@@ -28,11 +29,13 @@ class ResearchGraphState(TypedDict):
     content: str # Content for the final report
     conclusion: str # Conclusion for the final report
     final_report: str # Final report
+    reference_folders: List[str] # Restrict vector search to these uploaded references
 
 
 class PromptInputState(TypedDict):
     topic : str
     max_analysts : int
+    reference_folders : List[str]
     host_name : str
     guest_name : str
     host_background : str
@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.graphs.registry import compile_all
+from backend.models.embedding import EMBEDDING_MODEL
+from backend.models.reranker import get_reranker
+from backend.database.qdrant_manager import get_qdrant_manager
+from backend.speech_pool import SYNTHESIZER_POOL
+
+
+class WarmupState:
+    """記錄暖機進度，供就緒檢查端點使用"""
+
+    def __init__(self):
+        self.status = "pending"  # pending / running / ready / failed
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def to_dict(self) -> Dict:
+        return {"status": self.status, "timings": dict(self.timings), "error": self.error}
+
+
+WARMUP_STATE = WarmupState()
+
+
+def _timed(name: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    WARMUP_STATE.timings[name] = time.perf_counter() - start
+    print(f"暖機 {name} 完成：{WARMUP_STATE.timings[name]:.2f}s")
+    return result
+
+
+def warm_up() -> WarmupState:
+    """編譯所有圖、載入 Embedding、重排序模型與 Qdrant 連線並預先連線語音合成器；重複呼叫時只會執行一次"""
+    with WARMUP_STATE._lock:
+        if WARMUP_STATE.status in ("running", "ready"):
+            return WARMUP_STATE
+        WARMUP_STATE.status = "running"
+        WARMUP_STATE.error = None
+
+    try:
+        _timed("graphs", compile_all)
+        # hybrid 模式下 dense 與 sparse 共用同一份模型，載入一次即可
+        _timed("embedding", lambda: EMBEDDING_MODEL.load().embed_query("warm up"))
+        _timed("reranker", get_reranker)
+        _timed("qdrant", get_qdrant_manager)
+        # 語音合成器預先連線失敗(例如未設定金鑰)不影響其他功能就緒
+        try:
+            _timed("speech", SYNTHESIZER_POOL.warm)
+        except Exception as e:
+            print(f"語音合成器預熱失敗：{str(e)}")
+        WARMUP_STATE.status = "ready"
+    except Exception as e:
+        print(f"暖機失敗：{str(e)}")
+        WARMUP_STATE.status = "failed"
+        WARMUP_STATE.error = str(e)
+    return WARMUP_STATE
+
+
+def warm_up_in_background() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread